@@ -0,0 +1,3 @@
+alter table page
+    drop column revision_id,
+    drop column touched;
@@ -0,0 +1,3 @@
+alter table page
+    add column revision_id bigint,
+    add column touched     timestamptz;
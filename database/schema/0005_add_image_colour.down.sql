@@ -0,0 +1 @@
+drop table image_colour;
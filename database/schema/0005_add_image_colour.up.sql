@@ -0,0 +1,13 @@
+create table image_colour
+(
+    url        text        not null primary key, --immutable
+
+    etag       text,
+    red        smallint    not null,
+    green      smallint    not null,
+    blue       smallint    not null,
+    checked_at timestamptz not null,
+    used_at    timestamptz not null default now()
+);
+
+create index image_colour_used_at_idx on image_colour (used_at);
@@ -0,0 +1 @@
+drop table conversion_memo;
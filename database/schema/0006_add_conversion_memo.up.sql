@@ -0,0 +1,15 @@
+create table conversion_memo
+(
+    content_hash      text        not null, --immutable
+    wikia             text        not null, --immutable
+    converter_version integer     not null, --immutable
+
+    name              text        not null,
+    data              jsonb       not null,
+    url               text        not null,
+    used_at           timestamptz not null default now(),
+
+    primary key (content_hash, wikia, converter_version)
+);
+
+create index conversion_memo_used_at_idx on conversion_memo (used_at);
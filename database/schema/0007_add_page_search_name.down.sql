@@ -0,0 +1,7 @@
+drop index if exists page_search_name_prefix_idx;
+drop index if exists page_search_name_trgm_idx;
+
+alter table page
+    drop column if exists search_name;
+
+-- pg_trgm is left installed, it may have been installed before this migration or be used by something else
@@ -0,0 +1,9 @@
+create extension if not exists pg_trgm;
+
+-- Kept in step with normalise_page_name in the show service
+alter table page
+    add column search_name text not null
+        generated always as (btrim(regexp_replace(lower(name), '[^[:alnum:]]+', ' ', 'g'))) stored;
+
+create index page_search_name_trgm_idx on page using gin (search_name gin_trgm_ops);
+create index page_search_name_prefix_idx on page (wikia_id, search_name text_pattern_ops);
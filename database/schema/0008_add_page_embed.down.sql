@@ -0,0 +1,6 @@
+alter table page
+    drop column embed_version,
+    drop column embed;
+
+alter table page
+    alter column data type json using data::json;
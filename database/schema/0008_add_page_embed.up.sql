@@ -0,0 +1,16 @@
+alter table page
+    alter column data type jsonb using data::jsonb;
+
+-- Webhook message body show sends as is, rendered by the importer
+alter table page
+    add column embed         jsonb,
+    add column embed_version smallint;
+
+-- Embed version 1 is the page data wrapped in a message
+update page
+set embed         = jsonb_build_object('embeds', jsonb_build_array(data)),
+    embed_version = 1;
+
+alter table page
+    alter column embed set not null,
+    alter column embed_version set not null;
@@ -0,0 +1,2 @@
+drop table import_job_page;
+drop table import_job;
@@ -0,0 +1,32 @@
+create table import_job
+(
+    id                uuid        not null default uuid_generate_v4() primary key, --immutable
+
+    wikia_name        text        not null,                                        --immutable
+    category_name     text        not null,                                        --immutable
+    -- Where progress is reported, Discord accepts the token for 15 minutes
+    application_id    text        not null,                                        --immutable
+    interaction_token text        not null,                                        --immutable
+
+    -- queued, running, done or failed
+    status            text        not null default 'queued',
+    attempts          integer     not null default 0,
+    error             text,
+    created_at        timestamptz not null default now(),                          --immutable
+    heartbeat_at      timestamptz,
+    finished_at       timestamptz
+);
+
+create index import_job_pending_idx on import_job (created_at) where status in ('queued', 'running');
+
+-- A page an import finished, a resumed import skips it
+create table import_job_page
+(
+    job_id  uuid not null references import_job on delete cascade, --immutable
+    title   text not null,                                         --immutable
+
+    -- succeeded, failed or unchanged
+    outcome text not null,                                         --immutable
+
+    primary key (job_id, title)
+);
@@ -8,4 +8,6 @@ gcloud run deploy wikia-discord-commands-import-category  \
   --image gcr.io/silical/wikia-discord-commands-import-category \
   --region europe-west1 \
   --memory 512Mi \
+  --no-cpu-throttling \
+  --min-instances 1 \
   --max-instances 1
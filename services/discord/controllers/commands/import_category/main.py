@@ -1,5 +1,5 @@
 from os import environ
-from typing import Any, Callable, Coroutine, AsyncIterable
+from typing import Any, Callable, Collection, Coroutine, AsyncIterable
 from enum import Enum
 from ssl import create_default_context
 from datetime import datetime, timedelta
@@ -10,13 +10,21 @@ from DiscordInterpythons.handlers.handler import (
     ChatInputHandler, InteractionHandlerClass
 )
 from DiscordInterpythons.models.interaction import Interaction, InteractionResponse
+from DiscordInterpythons.models.snowflake import ApplicationID
 from DiscordInterpythons.providers.webhook import InteractionResponseAPI, UpdateWebhookMessageReq
-import asyncpg
 
 from services.discord.controllers.commands.import_category.providers import asyncpg as register
+from services.discord.controllers.commands.import_category.providers.asyncpg import PageOutcome
+from shared.asyncpg.pool import create_pool
 from services.discord.shared.providers.config.yaml import load
 from services.discord.shared.providers.discord import respond, enforce_me
-from services.discord.shared.providers.wikia.aiohttp import Wikia
+from services.discord.shared.providers.wikia.aiohttp import Wikia, open_session, close_session, open_cache, close_cache
+from services.discord.shared.providers.wikia.aiohttp.wikia import Page, PageRevision
+from services.discord.shared.providers.wikia.converters.colour_cache import open_colour_cache, close_colour_cache
+from services.discord.shared.providers.wikia.converters.convert_strategy import ConvertedPage, set_colour_mode
+from services.discord.shared.providers.wikia.converters.executor import start_executor, close_executor
+from services.discord.shared.providers.wikia.converters.instrumentation import PageReport, RunReport
+from services.discord.shared.providers.wikia.converters.memo import open_memo, close_memo
 from services.discord.shared.providers.wikia.converters.nova_drift import converter as novadrift_converter
 
 
@@ -46,39 +54,157 @@ class WikiaName(str, Enum):
 wikia_database = register.WikiaRegister(None)
 page_database = register.PageRegister(None)
 page_tag_database = register.PageTagRegister(None)
+image_colour_database = register.ImageColourRegister(None)
+conversion_memo_database = register.ConversionMemoRegister(None)
+import_job_database = register.ImportJobRegister(None)
 wikia_converters = {
     WikiaName.NOVA_DRIFT.value: novadrift_converter,
 }
 
 
-async def update_pages_from_category(wikia_name: WikiaName, category_name: str) -> AsyncIterable[tuple[str | None, str | None, float]]:
+BATCH_SIZE = 50
+
+
+async def convert_page(
+        page: Page,
+        run_report: RunReport | None = None,
+) -> ConvertedPage | None:
+    report = PageReport(page.title) if run_report is not None else None
+
+    try:
+        new_page = await wikia_converters[page.wikia](page, report)
+    except Exception as e:
+        return None
+
+    if report is not None:
+        run_report.add(report)
+
+    return new_page
+
+
+async def update_pages(
+        pages: list[Page],
+        wikia_id: register.WikiaID,
+        category_name: str,
+        run_report: RunReport | None = None,
+) -> tuple[list[tuple[str | None, str | None, str | None]], list[register.PageID]]:
+    new_pages = await asyncio.gather(*(convert_page(page, run_report) for page in pages))
+
+    # One write for the whole batch instead of a lookup and a write per page
+    new_page_ids = await page_database.upsert_many((i for i in new_pages if i is not None), wikia_id)
+
+    await page_tag_database.create_many(new_page_ids.values(), category_name)
+
+    return [
+        (new_page.name, None, None) if new_page is not None else (None, page.title, None)
+        for page, new_page in zip(pages, new_pages)
+    ], list(new_page_ids.values())
+
+
+async def update_pages_from_category(
+        wikia_name: WikiaName,
+        category_name: str,
+        run_report: RunReport | None = None,
+        done_titles: Collection[str] = (),
+) -> AsyncIterable[tuple[str | None, str | None, str | None, float]]:
+    """Yields each page of the category as it is imported, with the fraction of the category done
+
+    Pages in done_titles were imported by an earlier attempt and are skipped.
+    """
     wikia_id = await wikia_database.read_from_name(wikia_name)
     assert  wikia_id is not None
 
-    wikia_api = Wikia(wikia_name)
+    wikia_api = Wikia(
+        wikia_name,
+        concurrency=config.wikia.concurrency,
+        requests_per_second=config.wikia.requests_per_second,
+        max_requests_per_second=config.wikia.max_requests_per_second,
+    )
+
+    total_pages = await wikia_api.read_category_size(category_name)
+    known_revisions = await page_database.read_revisions(wikia_id)
+
+    semaphore = asyncio.Semaphore(config.wikia.concurrency)
+    results: asyncio.Queue[list[tuple[str | None, str | None, str | None]] | BaseException | None] = asyncio.Queue()
+
+    # Every page in the category, pages tagged before the import and missing from it are untagged at the end
+    category_page_ids = set()
+
+    async def _update_batch(batch: tuple[PageRevision, ...]):
+        async with semaphore:
+            # Read by the listed revision, so the content stored always matches the revision_id stored with it
+            pages = await wikia_api.read_pages_from_revisions(batch)
+
+            batch_results, page_ids = await update_pages(pages, wikia_id, category_name, run_report)
+            category_page_ids.update(page_ids)
 
-    page_names = await wikia_api.read_page_names_from_category_name(category_name)
+            results.put_nowait(batch_results)
 
-    total_pages = len(page_names)
-    for x, page_name in enumerate(page_names):
-        page = await wikia_api.read_page_from_name(page_name=page_name)
+    async def _tag_unchanged_batch(batch: tuple[tuple[str, register.PageID], ...]):
+        await page_tag_database.create_many((page_id for _, page_id in batch), category_name)
 
+        results.put_nowait([(None, None, page_name) for page_name, _ in batch])
+
+    async def _list_and_update():
+        # Batches start as soon as the listing returns enough names, later listing pages are still in flight
+        # Only pages whose latest revision differs from the stored one are fetched and converted
+        tasks = []
         try:
-            new_page = await wikia_converters[wikia_name](page)
+            batch, unchanged_batch = [], []
+            async for revision in wikia_api.iter_page_revisions_from_category_name(category_name):
+                known_revision = known_revisions.get(wikia_api.page_url(revision.title))
+
+                if known_revision is not None:
+                    # Kept even if converting it fails this time
+                    category_page_ids.add(known_revision.page_id)
+
+                if revision.title in done_titles:
+                    continue
+
+                if known_revision is not None and known_revision.revision_id == revision.revision_id:
+                    unchanged_batch.append((revision.title, known_revision.page_id))
+                else:
+                    batch.append(revision)
+
+                if len(batch) == BATCH_SIZE:
+                    tasks.append(asyncio.ensure_future(_update_batch(tuple(batch))))
+                    batch = []
+
+                if len(unchanged_batch) == BATCH_SIZE:
+                    tasks.append(asyncio.ensure_future(_tag_unchanged_batch(tuple(unchanged_batch))))
+                    unchanged_batch = []
+
+            if batch:
+                tasks.append(asyncio.ensure_future(_update_batch(tuple(batch))))
+
+            if unchanged_batch:
+                tasks.append(asyncio.ensure_future(_tag_unchanged_batch(tuple(unchanged_batch))))
+
+            await asyncio.gather(*tasks)
+
+            await page_tag_database.delete_stale(category_name, wikia_id, category_page_ids)
         except Exception as e:
-            yield None, page.title, x / total_pages
-            continue
+            results.put_nowait(e)
+        else:
+            results.put_nowait(None)
+        finally:
+            for task in tasks:
+                task.cancel()
 
-        new_page_id = await page_database.create_or_update(new_page, wikia_id)
+    producer = asyncio.ensure_future(_list_and_update())
 
-        await page_tag_database.read_or_create(register.PageTag(
-            page_id=new_page_id,
-            tag=category_name,
-        ))
+    x = len(done_titles)
+    try:
+        while (batch_results := await results.get()) is not None:
+            if isinstance(batch_results, BaseException):
+                raise batch_results
 
-        await asyncio.sleep(0.5)
+            for succeeded_page_name, failed_page_name, unchanged_page_name in batch_results:
+                x += 1
 
-        yield new_page.name, None, x / total_pages
+                yield succeeded_page_name, failed_page_name, unchanged_page_name, x / max(total_pages, x)
+    finally:
+        producer.cancel()
 
 
 class CommandHandler(InteractionHandlerClass):
@@ -90,18 +216,96 @@ class CommandHandler(InteractionHandlerClass):
         :param wikia_name: Name of the wikia being selected
         :param category_name: Name of the category being selected
         """
-        last_progress_call = datetime.now().replace(microsecond=0) - timedelta(seconds=0.5)
-
-        succeeded_page_names, failed_page_names = [], []
-        async for succeeded_page_name, failed_page_name, progress in update_pages_from_category(
+        # A worker imports it and edits this reply with its progress
+        await import_job_database.create(
             wikia_name.value,
             category_name,
+            str(interaction.application_id),
+            interaction.token,
+        )
+        _import_job_queued.set()
+
+        return interaction.response.reply(f"Queued import of {category_name} from {wikia_name.value}")
+
+
+def _format_run_report(run_report: RunReport | None) -> str:
+    if run_report is None:
+        return ""
+
+    return f"\n\nTimings: {run_report.summary()}"
+
+
+def _format_import(
+        succeeded_page_names: list[str],
+        failed_page_names: list[str],
+        unchanged_page_count: int,
+        run_report: RunReport | None,
+) -> str:
+    return (
+        f"Success: {', '.join(succeeded_page_names[-50:])}\n\n"
+        f"Failed: {', '.join(failed_page_names[-25:])}\n\n"
+        f"Unchanged: {unchanged_page_count}"
+        f"{_format_run_report(run_report)}"
+    )
+
+
+async def _report(job: register.ImportJob, content: str):
+    # Discord stops accepting edits to the reply after 15 minutes, the import carries on regardless
+    try:
+        await InteractionResponseAPI(
+            token=job.interaction_token,
+        ).update(
+            ApplicationID(job.application_id),
+            message=UpdateWebhookMessageReq(content=content),
+        )
+    except Exception as e:
+        print(f"Could not report import {job.id}: {e}")
+
+
+async def _heartbeat(job: register.ImportJob):
+    while True:
+        await asyncio.sleep(config.import_jobs.heartbeat_seconds)
+
+        # A missed beat is fine, only stale_seconds without one lets another worker take the job
+        try:
+            await import_job_database.heartbeat(job.id)
+        except Exception as e:
+            print(f"Could not beat for import {job.id}: {e}")
+
+
+async def run_import_job(job: register.ImportJob):
+    """Imports the job's category, checkpointing every finished page so a later attempt resumes after it"""
+    checkpoints = await import_job_database.read_checkpoints(job.id)
+
+    run_report = RunReport() if config.wikia.instrument else None
+
+    succeeded_page_names = [title for title, outcome in checkpoints.items() if outcome == PageOutcome.SUCCEEDED]
+    failed_page_names = [title for title, outcome in checkpoints.items() if outcome == PageOutcome.FAILED]
+    unchanged_page_count = sum(outcome == PageOutcome.UNCHANGED for outcome in checkpoints.values())
+
+    finished: list[tuple[str, PageOutcome]] = []
+
+    last_progress_call = datetime.now().replace(microsecond=0) - timedelta(seconds=0.5)
+
+    heartbeat = asyncio.ensure_future(_heartbeat(job))
+    try:
+        async for succeeded_page_name, failed_page_name, unchanged_page_name, progress in update_pages_from_category(
+            WikiaName(job.wikia_name).value,
+            job.category_name,
+            run_report,
+            checkpoints.keys(),
         ):
             if succeeded_page_name:
                 succeeded_page_names.append(succeeded_page_name)
+                finished.append((succeeded_page_name, PageOutcome.SUCCEEDED))
 
             if failed_page_name:
                 failed_page_names.append(failed_page_name)
+                finished.append((failed_page_name, PageOutcome.FAILED))
+
+            if unchanged_page_name:
+                unchanged_page_count += 1
+                finished.append((unchanged_page_name, PageOutcome.UNCHANGED))
 
             now = datetime.now().replace(microsecond=0)
             if now - last_progress_call < timedelta(seconds=0.5):
@@ -109,42 +313,164 @@ class CommandHandler(InteractionHandlerClass):
 
             last_progress_call = now
 
-            response = interaction.response.reply((
+            await import_job_database.checkpoint(job.id, finished)
+            finished = []
+
+            await _report(job, (
                 f"Progress {progress*100:.3f}%\n\n"
-                f"Success: {', '.join(succeeded_page_names[-50:])}\n\n"
-                f"Failed: {', '.join(failed_page_names[-25:])}"
+                f"{_format_import(succeeded_page_names, failed_page_names, unchanged_page_count, run_report)}"
             ))
 
-            await InteractionResponseAPI(
-                token=interaction.token,
-            ).update(
-                interaction.application_id,
-                message=UpdateWebhookMessageReq(
-                    content=response.data.content,
-                    embeds=response.data.embeds,
-                ),
-            )
-
-        return interaction.response.reply((
-            f"Success: {', '.join(succeeded_page_names[-50:])}\n\n"
-            f"Failed: {', '.join(failed_page_names[-25:])}"
-        ))
+        await import_job_database.checkpoint(job.id, finished)
+    finally:
+        heartbeat.cancel()
+
+    await import_job_database.finish(job.id, register.ImportJobStatus.DONE)
+
+    await _report(job, _format_import(succeeded_page_names, failed_page_names, unchanged_page_count, run_report))
+
+
+# Set when this instance queues a job, so an idle worker starts it without waiting for its next poll
+_import_job_queued = asyncio.Event()
+
+_import_workers: list[asyncio.Task] = []
+
+
+async def _claim_import_job() -> None | register.ImportJob:
+    stale_after = timedelta(seconds=config.import_jobs.stale_seconds)
+
+    for job in await import_job_database.fail_abandoned(stale_after, config.import_jobs.max_attempts):
+        await _report(job, "Import failed, it was interrupted too many times")
+
+    return await import_job_database.claim(stale_after, config.import_jobs.max_attempts)
+
+
+async def import_worker():
+    """Runs queued imports one at a time, any number of these may run across instances"""
+    while True:
+        _import_job_queued.clear()
+
+        try:
+            job = await _claim_import_job()
+        except Exception as e:
+            print(f"Could not claim an import: {e}")
+            job = None
+
+        if job is None:
+            try:
+                await asyncio.wait_for(_import_job_queued.wait(), config.import_jobs.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+            continue
+
+        # Cancelling leaves the job running, it is resumed once its heartbeat goes stale
+        try:
+            await run_import_job(job)
+        except Exception as e:
+            await _report(job, f"Encountered an Unexpected Error: {e}")
+
+            try:
+                await import_job_database.finish(job.id, register.ImportJobStatus.FAILED, str(e))
+            except Exception as finish_error:
+                # Left running, so it is retried once its heartbeat goes stale
+                print(f"Could not fail import {job.id}: {finish_error}")
+
+
+async def start_import_workers(_: web.Application):
+    for _ in range(config.import_jobs.workers):
+        _import_workers.append(asyncio.ensure_future(import_worker()))
+
+
+async def stop_import_workers(_: web.Application):
+    for worker in _import_workers:
+        worker.cancel()
+
+    await asyncio.gather(*_import_workers, return_exceptions=True)
+    _import_workers.clear()
+
 
 async def connect_db(_: web.Application):
-    pool = await asyncpg.create_pool(
-        dsn=config.database.dsn,
+    await create_pool(
+        config.database.dsn,
+        (
+            wikia_database,
+            page_database,
+            page_tag_database,
+            image_colour_database,
+            conversion_memo_database,
+            import_job_database,
+        ),
         ssl=create_default_context(cadata=config.database.ssl_cert),
         server_settings={"application_name": "wikia-discord-commands-import-category"},
     )
 
-    wikia_database.pool = pool
-    page_database.pool = pool
-    page_tag_database.pool = pool
+
+async def open_response_cache(_: web.Application):
+    if config.wikia.cache_path is None:
+        return
+
+    open_cache(
+        config.wikia.cache_path,
+        ttl=config.wikia.cache_ttl,
+        max_bytes=config.wikia.cache_max_bytes,
+        offline=config.wikia.cache_offline,
+    )
+
+
+async def close_response_cache(_: web.Application):
+    close_cache()
+
+
+async def open_image_colour_cache(_: web.Application):
+    await image_colour_database.prune(config.wikia.colour_cache_max_rows)
+
+    open_colour_cache(
+        image_colour_database,
+        maxsize=config.wikia.colour_cache_size,
+        ttl=timedelta(seconds=config.wikia.colour_cache_ttl),
+    )
+
+
+async def close_image_colour_cache(_: web.Application):
+    close_colour_cache()
+
+
+async def open_conversion_memo(_: web.Application):
+    for converter in wikia_converters.values():
+        await conversion_memo_database.delete_other_versions(converter.wikia, converter.version)
+
+    await conversion_memo_database.prune(config.wikia.memo_max_rows)
+
+    open_memo(conversion_memo_database, maxsize=config.wikia.memo_size)
+
+
+async def close_conversion_memo(_: web.Application):
+    close_memo()
+
+
+async def open_converter_pool(_: web.Application):
+    # Parsing and the sync handlers run in the pool so the loop keeps answering while a category imports
+    start_executor(config.wikia.converter_processes)
+    set_colour_mode(config.wikia.colour_mode)
 
 
 app = web.Application()
 
 app.on_startup.append(connect_db)
+app.on_startup.append(open_session)
+app.on_startup.append(open_response_cache)
+app.on_startup.append(open_image_colour_cache)
+app.on_startup.append(open_conversion_memo)
+app.on_startup.append(open_converter_pool)
+app.on_startup.append(start_import_workers)
+
+app.on_cleanup.append(stop_import_workers)
+app.on_cleanup.append(close_session)
+app.on_cleanup.append(close_response_cache)
+app.on_cleanup.append(close_image_colour_cache)
+app.on_cleanup.append(close_conversion_memo)
+app.on_cleanup.append(close_executor)
 
 
 app.router.add_post(f"/discord/interactions/commands/import/category", respond(
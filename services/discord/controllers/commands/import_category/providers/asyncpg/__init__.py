@@ -1,3 +1,6 @@
 from .wikia import *
 from .page import *
 from .page_tag import *
+from .image_colour import *
+from .conversion_memo import *
+from .import_job import *
@@ -0,0 +1,66 @@
+from shared.asyncpg.register import Register
+from services.discord.shared.providers.wikia.converters.convert_strategy import ConvertedPage
+
+
+_READ = """
+update conversion_memo
+set used_at = now()
+where content_hash = $1
+  and wikia = $2
+  and converter_version = $3
+returning name, data, url
+"""
+
+
+_WRITE = """
+insert into conversion_memo(content_hash, wikia, converter_version, name, data, url)
+values($1::text, $2::text, $3::integer, $4::text, $5::jsonb, $6::text)
+on conflict (content_hash, wikia, converter_version) do update
+set name = excluded.name,
+    data = excluded.data,
+    url = excluded.url,
+    used_at = now()
+"""
+
+
+class ConversionMemoRegister(Register):
+    statements = (_READ, _WRITE)
+
+    async def read(self, key: str, wikia: str, version: int) -> None | ConvertedPage:
+        records = await self.fetch(_READ, key, wikia, version)
+
+        if len(records) != 1:
+            return None
+
+        return ConvertedPage(
+            name=records[0]["name"],
+            data=records[0]["data"],
+            url=records[0]["url"],
+        )
+
+    async def write(self, key: str, wikia: str, version: int, page: ConvertedPage):
+        await self.execute(_WRITE, key, wikia, version, page.name, page.data.dict(), page.url)
+
+    async def delete_other_versions(self, wikia: str, version: int):
+        """Drops what earlier or later versions of a converter memoised"""
+        query = """
+        delete from conversion_memo
+        where wikia = $1
+          and converter_version <> $2
+        """
+
+        await self.execute(query, wikia, version)
+
+    async def prune(self, max_rows: int):
+        """Deletes the least recently used pages past the first max_rows"""
+        query = """
+        delete from conversion_memo
+        where (content_hash, wikia, converter_version) in (
+            select content_hash, wikia, converter_version
+            from conversion_memo
+            order by used_at desc
+            offset $1
+        )
+        """
+
+        await self.execute(query, max_rows)
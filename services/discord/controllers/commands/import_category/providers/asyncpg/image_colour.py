@@ -0,0 +1,59 @@
+from shared.asyncpg.register import Register
+from services.discord.shared.providers.wikia.converters.colour_cache import ImageColour
+
+
+_READ = """
+update image_colour
+set used_at = now()
+where url = $1
+returning url, etag, red, green, blue, checked_at
+"""
+
+
+_WRITE = """
+insert into image_colour(url, etag, red, green, blue, checked_at)
+values($1::text, $2::text, $3::smallint, $4::smallint, $5::smallint, $6::timestamptz)
+on conflict (url) do update
+set etag = excluded.etag,
+    red = excluded.red,
+    green = excluded.green,
+    blue = excluded.blue,
+    checked_at = excluded.checked_at,
+    used_at = now()
+"""
+
+
+class ImageColourRegister(Register):
+    statements = (_READ, _WRITE)
+
+    async def read(self, url: str) -> None | ImageColour:
+        records = await self.fetch(_READ, url)
+
+        if len(records) != 1:
+            return None
+
+        record = records[0]
+
+        return ImageColour(
+            url=record["url"],
+            etag=record["etag"],
+            colour=(record["red"], record["green"], record["blue"]),
+            checked_at=record["checked_at"],
+        )
+
+    async def write(self, image_colour: ImageColour):
+        await self.execute(_WRITE, image_colour.url, image_colour.etag, *image_colour.colour, image_colour.checked_at)
+
+    async def prune(self, max_rows: int):
+        """Deletes the least recently used colours past the first max_rows"""
+        query = """
+        delete from image_colour
+        where url in (
+            select url
+            from image_colour
+            order by used_at desc
+            offset $1
+        )
+        """
+
+        await self.execute(query, max_rows)
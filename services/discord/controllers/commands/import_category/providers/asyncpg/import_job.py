@@ -0,0 +1,165 @@
+from dataclasses import dataclass
+from datetime import timedelta
+from enum import Enum
+from typing import Iterable
+import uuid
+
+import asyncpg
+
+from shared.asyncpg.register import Register
+
+
+class ImportJobID(uuid.UUID):
+    pass
+
+
+class ImportJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class PageOutcome(str, Enum):
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    UNCHANGED = "unchanged"
+
+
+@dataclass
+class ImportJob:
+    id: ImportJobID
+    wikia_name: str
+    category_name: str
+    application_id: str
+    interaction_token: str
+    attempts: int
+
+
+def _to_job(record: asyncpg.Record) -> ImportJob:
+    return ImportJob(
+        id=record["id"],
+        wikia_name=record["wikia_name"],
+        category_name=record["category_name"],
+        application_id=record["application_id"],
+        interaction_token=record["interaction_token"],
+        attempts=record["attempts"],
+    )
+
+
+_CLAIM = """
+update import_job
+set status = 'running',
+    attempts = attempts + 1,
+    heartbeat_at = now()
+where id = (
+    select id
+    from import_job
+    where attempts < $2
+      and (status = 'queued' or (status = 'running' and heartbeat_at < now() - $1::interval))
+    order by created_at
+    limit 1
+    for update skip locked
+)
+returning id, wikia_name, category_name, application_id, interaction_token, attempts
+"""
+
+_CHECKPOINT = """
+with heartbeat as (
+    update import_job
+    set heartbeat_at = now()
+    where id = $1
+)
+insert into import_job_page(job_id, title, outcome)
+select $1, unnest($2::text[]), unnest($3::text[])
+on conflict (job_id, title) do nothing
+"""
+
+_HEARTBEAT = """
+update import_job
+set heartbeat_at = now()
+where id = $1
+"""
+
+
+class ImportJobRegister(Register):
+    statements = (_CLAIM, _CHECKPOINT, _HEARTBEAT)
+
+    async def create(
+            self,
+            wikia_name: str,
+            category_name: str,
+            application_id: str,
+            interaction_token: str,
+    ) -> ImportJobID:
+        query = """
+        insert into import_job(wikia_name, category_name, application_id, interaction_token)
+        values($1::text, $2::text, $3::text, $4::text)
+        returning id
+        """
+
+        records = await self.fetch(query, wikia_name, category_name, application_id, interaction_token)
+
+        return records[0]["id"]
+
+    async def claim(self, stale_after: timedelta, max_attempts: int) -> None | ImportJob:
+        """Takes the oldest queued job, or a running one whose worker stopped beating, without waiting on others"""
+        record = await self.fetchrow(_CLAIM, stale_after, max_attempts)
+
+        if record is None:
+            return None
+
+        return _to_job(record)
+
+    async def heartbeat(self, job_id: ImportJobID):
+        await self.execute(_HEARTBEAT, job_id)
+
+    async def checkpoint(self, job_id: ImportJobID, outcomes: Iterable[tuple[str, PageOutcome]]):
+        """Records the pages the job has finished, which also counts as a heartbeat"""
+        outcomes = list(outcomes)
+
+        await self.execute(
+            _CHECKPOINT,
+            job_id,
+            [title for title, _ in outcomes],
+            [outcome.value for _, outcome in outcomes],
+        )
+
+    async def read_checkpoints(self, job_id: ImportJobID) -> dict[str, PageOutcome]:
+        query = """
+        select title, outcome
+        from import_job_page
+        where job_id = $1
+        """
+
+        records = await self.fetch(query, job_id)
+
+        return {record["title"]: PageOutcome(record["outcome"]) for record in records}
+
+    async def finish(self, job_id: ImportJobID, status: ImportJobStatus, error: str | None = None):
+        query = """
+        update import_job
+        set status = $2,
+            error = $3,
+            finished_at = now()
+        where id = $1
+        """
+
+        await self.execute(query, job_id, status.value, error)
+
+    async def fail_abandoned(self, stale_after: timedelta, max_attempts: int) -> list[ImportJob]:
+        """Fails jobs whose workers stopped max_attempts times, so they are not claimed again"""
+        query = """
+        update import_job
+        set status = 'failed',
+            error = 'Stopped too many times',
+            finished_at = now()
+        where status = 'running'
+          and attempts >= $2
+          and heartbeat_at < now() - $1::interval
+        returning id, wikia_name, category_name, application_id, interaction_token, attempts
+        """
+
+        records = await self.fetch(query, stale_after, max_attempts)
+
+        return [_to_job(record) for record in records]
@@ -1,12 +1,14 @@
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Iterable
 import uuid
 from pydantic import Json
 
 
 from shared.asyncpg.register import Register
-from shared.asyncpg.type_coerce import type_convert_to_record
 from shared.pydantic import BaseModel
+from services.discord.shared.providers.page_embed import EMBED_VERSION, render_embed
+from services.discord.shared.providers.page_events import PAGE_CHANGED_CHANNEL, PageChanged
 
 from .wikia import WikiaID
 
@@ -31,13 +33,58 @@ class Page(BaseModel):
     name: str
     data: Json[PageData] | PageData
     url: str
+    revision_id: int | None = None
+    touched: datetime | None = None
 
 
 class PageID(uuid.UUID):
     pass
 
 
+@dataclass
+class PageRevision:
+    page_id: PageID
+    revision_id: int | None
+
+
+_UPSERT_MANY = """
+insert into page(name, wikia_id, data, embed, embed_version, url, revision_id, touched)
+select name, $1::uuid, data, embed, $7::smallint, url, revision_id, touched
+from unnest($2::text[], $3::jsonb[], $4::text[], $5::bigint[], $6::timestamptz[], $8::jsonb[])
+    as new_page(name, data, url, revision_id, touched, embed)
+on conflict (url) do update
+set data = excluded.data,
+    embed = excluded.embed,
+    embed_version = excluded.embed_version,
+    revision_id = excluded.revision_id,
+    touched = excluded.touched
+returning id, url, wikia_id, name, search_name, xmax = 0 as created
+"""
+
+_NOTIFY_PAGE_CHANGED = """
+select pg_notify($1, payload)
+from unnest($2::text[]) as payload
+"""
+
+
 class PageRegister(Register):
+    statements = (_UPSERT_MANY, _NOTIFY_PAGE_CHANGED)
+
+    async def read_revisions(self, wikia_id: WikiaID) -> dict[str, PageRevision]:
+        """Stored revisions by url, a page with an outdated embed has no revision so it is imported again"""
+        query = """
+        select id, url, case when embed_version = $2 then revision_id end as revision_id
+        from page
+        where wikia_id = $1
+        """
+
+        records = await self.fetch(query, wikia_id, EMBED_VERSION)
+
+        return {
+            record["url"]: PageRevision(page_id=record["id"], revision_id=record["revision_id"])
+            for record in records
+        }
+
     async def read_from_url(self, url: str, wikia_id: WikiaID) -> None | PageID:
         query = """
         select id
@@ -46,9 +93,7 @@ class PageRegister(Register):
           and wikia_id = $2
         """
 
-        async with self.pool.acquire() as conn:
-            records = await conn.fetch(query, url, wikia_id)
-        records = type_convert_to_record(records)
+        records = await self.fetch(query, url, wikia_id)
 
         if len(records) != 1:
             return None
@@ -56,35 +101,77 @@ class PageRegister(Register):
         return records[0]["id"]
 
     async def create_or_update(self, page: Page, wikia_id: WikiaID) -> PageID:
-        page_id = await self.read_from_url(page.url, wikia_id)
+        page_ids = await self.upsert_many((page,), wikia_id)
+
+        return page_ids[page.url]
+
+    async def upsert_many(self, pages: Iterable[Page], wikia_id: WikiaID) -> dict[str, PageID]:
+        """Creates or updates every page in one statement, returning their ids by url
 
-        if page_id is not None:
-            return await self.update(page, page_id)
+        Each written page is announced on PAGE_CHANGED_CHANNEL.
+        """
+        # A statement can't update the same row twice, so only the last page for each url is written
+        pages = list({page.url: page for page in pages}.values())
+
+        if not pages:
+            return {}
 
-        return await self.create(page, wikia_id)
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                records = await conn.fetch_prepared(
+                    _UPSERT_MANY,
+                    wikia_id,
+                    [page.name for page in pages],
+                    [page.data.dict() for page in pages],
+                    [page.url for page in pages],
+                    [page.revision_id for page in pages],
+                    [page.touched for page in pages],
+                    EMBED_VERSION,
+                    [render_embed(page.data) for page in pages],
+                )
+
+                # Delivered on commit, so listeners never see a page before it can be read
+                await conn.fetch_prepared(_NOTIFY_PAGE_CHANGED, PAGE_CHANGED_CHANNEL, [
+                    PageChanged(
+                        wikia_id=record["wikia_id"],
+                        page_id=record["id"],
+                        name=record["name"],
+                        search_name=record["search_name"],
+                        created=record["created"],
+                    ).json()
+                    for record in records
+                ])
+
+        return {record["url"]: record["id"] for record in records}
 
     async def create(self, page: Page, wikia_id: WikiaID) -> PageID:
         query = """
-        insert into page(name, wikia_id, data, url)
-        values($1::text, $2::uuid, $3::jsonb, $4::text)
+        insert into page(name, wikia_id, data, url, revision_id, touched, embed, embed_version)
+        values($1::text, $2::uuid, $3::jsonb, $4::text, $5::bigint, $6::timestamptz, $7::jsonb, $8::smallint)
         returning id
         """
 
-        async with self.pool.acquire() as conn:
-            records = await conn.fetch(query, page.name, wikia_id, page.data.json(), page.url)
-        records = type_convert_to_record(records)
+        records = await self.fetch(
+            query, page.name, wikia_id, page.data.dict(), page.url, page.revision_id, page.touched,
+            render_embed(page.data), EMBED_VERSION,
+        )
 
         return records[0]["id"]
 
     async def update(self, page: Page, page_id: PageID) -> PageID:
         query = """
         update page 
-        set data = $1
+        set data = $1,
+            revision_id = $3,
+            touched = $4,
+            embed = $5,
+            embed_version = $6
         where id = $2
         """
 
-        async with self.pool.acquire() as conn:
-            records = await conn.fetch(query, page.data.json(), page_id)
-        records = type_convert_to_record(records)
+        await self.execute(
+            query, page.data.dict(), page_id, page.revision_id, page.touched,
+            render_embed(page.data), EMBED_VERSION,
+        )
 
         return page_id
\ No newline at end of file
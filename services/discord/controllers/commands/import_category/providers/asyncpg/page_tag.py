@@ -1,11 +1,12 @@
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Iterable
 import uuid
 
 from shared.asyncpg.register import Register
-from shared.asyncpg.type_coerce import type_convert_to_record
 
 from .page import PageID
+from .wikia import WikiaID
 
 
 @dataclass
@@ -14,25 +15,46 @@ class PageTag:
     tag: str
 
 
+_CREATE_MANY = """
+insert into page_tag(page_id, tag)
+select unnest($1::uuid[]), $2::text
+on conflict (page_id, tag) do nothing
+"""
+
+
 class PageTagRegister(Register):
+    statements = (_CREATE_MANY,)
+
     async def create(self, page_tag: PageTag):
         query = """
         insert into page_tag(page_id, tag)
         values($1, $2)
         """
 
-        async with self.pool.acquire() as conn:
-            await conn.fetch(query, page_tag.page_id, page_tag.tag)
+        await self.execute(query, page_tag.page_id, page_tag.tag)
 
     async def read_or_create(self, page_tag: PageTag):
         query = """
             select exists(select 1 from page_tag where page_id = $1 and tag = $2)
         """
-        async with self.pool.acquire() as conn:
-            records = await conn.fetch(query, page_tag.page_id, page_tag.tag)
-        records = type_convert_to_record(records)
+        records = await self.fetch(query, page_tag.page_id, page_tag.tag)
 
         if records[0]["exists"]:
             return
 
-        return await self.create(page_tag)
\ No newline at end of file
+        return await self.create(page_tag)
+
+    async def create_many(self, page_ids: Iterable[PageID], tag: str):
+        """Tags every page in one statement, pages that already have the tag are left alone"""
+        await self.execute(_CREATE_MANY, list(page_ids), tag)
+
+    async def delete_stale(self, tag: str, wikia_id: WikiaID, page_ids: Iterable[PageID]):
+        """Removes tag from the wikia's pages that are not in page_ids"""
+        query = """
+        delete from page_tag
+        where tag = $1
+          and page_id in (select id from page where wikia_id = $2)
+          and page_id <> all($3::uuid[])
+        """
+
+        await self.execute(query, tag, wikia_id, list(page_ids))
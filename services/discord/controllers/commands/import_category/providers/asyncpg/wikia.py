@@ -2,24 +2,24 @@ from datetime import datetime
 import uuid
 
 from shared.asyncpg.register import Register
-from shared.asyncpg.type_coerce import type_convert_to_record
 
 
 class WikiaID(uuid.UUID):
     pass
 
 
+_READ_FROM_NAME = """
+select id
+from wikia
+where name = $1
+"""
+
+
 class WikiaRegister(Register):
+    statements = (_READ_FROM_NAME,)
+
     async def read_from_name(self, name: str) -> None | WikiaID:
-        query = """
-        select id
-        from wikia
-        where name = $1
-        """
-
-        async with self.pool.acquire() as conn:
-            records = await conn.fetch(query, name)
-        records = type_convert_to_record(records)
+        records = await self.fetch(_READ_FROM_NAME, name)
 
         if len(records) != 1:
             return None
@@ -3,16 +3,19 @@ from typing import Any, Callable, Coroutine
 from ssl import create_default_context
 
 from aiohttp import web
-import asyncpg
 from DiscordInterpythons.handlers.handler import (
     ChatInputHandler, InteractionHandlerClass
 )
 from DiscordInterpythons.models.interaction import Interaction
-from DiscordInterpythons.models.embed import Embed
 
+from services.discord.controllers.commands.show.page_cache import PageCache
 from services.discord.controllers.commands.show.providers import asyncpg as register
+from shared.asyncpg.pool import create_pool
 from services.discord.shared.providers.config.yaml import load
-from services.discord.shared.providers.discord import respond, enforce_administrator, enforce_guild_only
+from services.discord.shared.providers.discord import (
+    MAX_CHOICES, MAX_CHOICE_LENGTH, RawReply, autocomplete, close_raw_reply_session, respond,
+    enforce_administrator, enforce_guild_only,
+)
 
 
 _type_callable_web_request_website = Callable[
@@ -29,6 +32,12 @@ config = load(IS_PROD)
 
 wikia_database = register.WikiaRegister(None)
 page_database = register.PageRegister(None)
+page_cache = PageCache(
+    wikia_database,
+    page_database,
+    maxsize=config.show.cache_size,
+    ttl=config.show.cache_ttl,
+)
 
 
 class CommandHandler(InteractionHandlerClass):
@@ -39,34 +48,60 @@ class CommandHandler(InteractionHandlerClass):
         :param page_name: Name of the page being selected
         """
 
-        wikia_id = await wikia_database.read_from_name("nova-drift")
+        wikia_id = await page_cache.read_wikia_id("nova-drift")
 
-        result = await page_database.read_from_name(page_name, wikia_id)
+        result = await page_cache.read_page(page_name, wikia_id)
 
         if result is None:
             return interaction.response.reply("Page not found")
 
-        return interaction.response.complex_reply(
-            embeds=Embed(**result.dict()),
-        )
+        # Stored ready to send, so it is never decoded here
+        return RawReply(result.embed)
+
+
+async def suggest_page_names(_: dict, page_name: str) -> list[tuple[str, str]]:
+    # Every keystroke lands here, so it is answered from memory, the wikia id is the only possible query
+    wikia_id = await page_cache.read_wikia_id("nova-drift")
+
+    if wikia_id is None:
+        return []
+
+    return page_cache.suggest(page_name, wikia_id, MAX_CHOICES, MAX_CHOICE_LENGTH)
+
 
 async def connect_db(_: web.Application):
-    pool = await asyncpg.create_pool(
-        dsn=config.database.dsn,
+    await create_pool(
+        config.database.dsn,
+        (wikia_database, page_database),
         ssl=create_default_context(cadata=config.database.ssl_cert),
         server_settings={"application_name": "wikia-discord-commands-show"},
     )
 
-    wikia_database.pool = pool
-    page_database.pool = pool
+
+async def listen_page_changes(_: web.Application):
+    await page_cache.listen(page_database.pool)
+
+
+async def stop_page_changes(_: web.Application):
+    await page_cache.close(page_database.pool)
 
 
 app = web.Application()
 
 app.on_startup.append(connect_db)
+app.on_startup.append(listen_page_changes)
+
+app.on_cleanup.append(stop_page_changes)
+app.on_cleanup.append(close_raw_reply_session)
 
 app.router.add_post(f"/discord/interactions/commands/show", respond(
     CommandHandler().action._call,
     IS_PROD,
     config.discord.public_key,
 ))
+
+app.router.add_post(f"/discord/interactions/autocomplete/show", autocomplete(
+    suggest_page_names,
+    IS_PROD,
+    config.discord.public_key,
+))
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+from asyncpg.pool import Pool
+import asyncio
+import asyncpg
+
+from services.discord.controllers.commands.show.page_index import PageNameIndex
+from services.discord.controllers.commands.show.providers import asyncpg as register
+from services.discord.shared.providers.page_events import PAGE_CHANGED_CHANNEL, PageChanged
+from shared.cache import LRUCache
+
+
+__all__ = (
+    "PageCache",
+)
+
+
+_LISTEN_RETRY_SECONDS = 5
+
+
+def _chosen_page_id(page_name: str) -> register.PageID | None:
+    try:
+        return register.PageID(page_name)
+    except ValueError:
+        return None
+
+
+class PageCache:
+    """Resolves page names in memory and caches the pages they resolve to
+
+    The importer announces every page it writes, which updates the name index and evicts the cached page.
+    Until the listener is connected nothing is cached, as nothing would evict it.
+    """
+
+    def __init__(
+            self,
+            wikia_database: register.WikiaRegister,
+            page_database: register.PageRegister,
+            maxsize: int = 4096,
+            ttl: float = 10 * 60,
+    ):
+        self.wikia_database = wikia_database
+        self.page_database = page_database
+
+        self._wikia_ids: LRUCache[str, register.WikiaID] = LRUCache(64, ttl)
+        self._pages: LRUCache[register.PageID, register.FoundPage] = LRUCache(maxsize, ttl)
+        self._indexes: dict[register.WikiaID, PageNameIndex] = {}
+        # Changes heard while the indexes load, replayed over them once loaded
+        self._pending: list[PageChanged] | None = None
+
+        self._listener: asyncpg.Connection | None = None
+        self._reconnect: asyncio.Task | None = None
+
+    @property
+    def is_listening(self) -> bool:
+        return self._listener is not None and not self._listener.is_closed()
+
+    async def read_wikia_id(self, name: str) -> register.WikiaID | None:
+        wikia_id = self._wikia_ids.get(name)
+
+        if wikia_id is None:
+            wikia_id = await self.wikia_database.read_from_name(name)
+
+            if wikia_id is not None and self.is_listening:
+                self._wikia_ids.set(name, wikia_id)
+
+        return wikia_id
+
+    def index(self, wikia_id: register.WikiaID) -> PageNameIndex:
+        return self._indexes.get(wikia_id) or PageNameIndex()
+
+    async def read_page(self, page_name: str, wikia_id: register.WikiaID) -> register.FoundPage | None:
+        """Resolves page_name from the index, or with the indexed name search when the index is not loaded or misses
+
+        page_name may also be the page id suggest gave for a name too long to be a choice's value.
+        """
+        index = self._indexes.get(wikia_id)
+        page_id = _chosen_page_id(page_name)
+
+        if page_id is None and index is not None:
+            page_id = index.resolve(page_name)
+
+        if page_id is None:
+            found = await self.page_database.read_from_name(page_name, wikia_id)
+        else:
+            found = self._pages.get(page_id) or await self.page_database.read(page_id)
+
+        if found is not None and self.is_listening:
+            self._pages.set(found.id, found)
+
+        return found
+
+    def suggest(
+            self,
+            page_name: str,
+            wikia_id: register.WikiaID,
+            limit: int,
+            max_length: int,
+    ) -> list[tuple[str, str]]:
+        """(name, value) choices, the value is the name or the page id when the name is longer than max_length"""
+        index = self.index(wikia_id)
+        names = ((index.name(page_id), page_id) for page_id in index.matches(page_name, limit))
+
+        return [(name, name if len(name) <= max_length else str(page_id)) for name, page_id in names]
+
+    async def load(self):
+        """Builds every wikia's name index, a change heard meanwhile is applied over it"""
+        self._pending = []
+
+        try:
+            names = await self.page_database.read_names()
+        finally:
+            pending, self._pending = self._pending, None
+
+        indexes: dict[register.WikiaID, PageNameIndex] = {}
+
+        for page in names:
+            indexes.setdefault(page.wikia_id, PageNameIndex()).add(page.id, page.name, page.search_name)
+
+        self._indexes = indexes
+
+        for change in pending:
+            self.apply(change)
+
+    def apply(self, change: PageChanged):
+        if self._pending is not None:
+            self._pending.append(change)
+
+        self._indexes.setdefault(change.wikia_id, PageNameIndex()).add(
+            change.page_id,
+            change.name,
+            change.search_name,
+        )
+        self._pages.pop(change.page_id)
+
+    def clear(self):
+        self._wikia_ids.clear()
+        self._pages.clear()
+
+    async def listen(self, pool: Pool):
+        """Holds a connection listening for page changes, reconnecting if it is lost
+
+        The indexes are loaded once listening, so no change is missed between the two.
+        """
+        try:
+            listener = await pool.acquire()
+            await listener.add_listener(PAGE_CHANGED_CHANNEL, self._on_page_changed)
+        except (OSError, asyncpg.PostgresError):
+            self._schedule_listen(pool)
+            return
+
+        listener.add_termination_listener(lambda _: self._on_listener_lost(pool))
+        self._listener = listener
+
+        try:
+            await self.load()
+        except (OSError, asyncpg.PostgresError):
+            await self.close(pool)
+            self._schedule_listen(pool)
+
+    async def close(self, pool: Pool):
+        if self._reconnect is not None:
+            self._reconnect.cancel()
+            self._reconnect = None
+
+        if self._listener is None:
+            return
+
+        listener, self._listener = self._listener, None
+
+        if not listener.is_closed():
+            await listener.remove_listener(PAGE_CHANGED_CHANNEL, self._on_page_changed)
+            await pool.release(listener)
+
+    def _on_page_changed(self, connection, pid, channel, payload: str):
+        self.apply(PageChanged.parse_raw(payload))
+
+    def _on_listener_lost(self, pool: Pool):
+        # Changes made while disconnected were never heard of, the indexes are reloaded on reconnecting
+        self._listener = None
+        self.clear()
+        self._schedule_listen(pool)
+
+    def _schedule_listen(self, pool: Pool):
+        async def _retry():
+            await asyncio.sleep(_LISTEN_RETRY_SECONDS)
+            self._reconnect = None
+            await self.listen(pool)
+
+        if self._reconnect is None:
+            self._reconnect = asyncio.ensure_future(_retry())
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from itertools import chain, islice
+import re
+
+from services.discord.controllers.commands.show.providers.asyncpg import PageID, normalise_page_name
+
+
+__all__ = (
+    "SIMILARITY_THRESHOLD",
+    "MAX_CANDIDATES",
+    "trigrams",
+    "similarity",
+    "PageNameIndex",
+)
+
+
+# pg_trgm's default similarity_threshold, below which a page is not a match
+SIMILARITY_THRESHOLD = 0.3
+
+# Most entries a query looks at per kind of match, so a short or common query never scans a whole wikia
+MAX_CANDIDATES = 1024
+
+
+def trigrams(search_name: str) -> frozenset[str]:
+    """Trigrams of a normalised name, padded per word as pg_trgm's show_trgm does"""
+    return frozenset(
+        padded[i:i + 3]
+        for word in re.findall(r"[^\W_]+", search_name)
+        for padded in (f"  {word} ",)
+        for i in range(len(padded) - 2)
+    )
+
+
+def _inner_trigrams(search_name: str) -> frozenset[str]:
+    """Unpadded trigrams of each word, every name containing search_name has all of them"""
+    return frozenset(
+        word[i:i + 3]
+        for word in re.findall(r"[^\W_]+", search_name)
+        for i in range(len(word) - 2)
+    )
+
+
+def similarity(first: frozenset[str], second: frozenset[str]) -> float:
+    if not first or not second:
+        return 0.0
+
+    shared = len(first & second)
+
+    return shared / (len(first) + len(second) - shared)
+
+
+@dataclass(frozen=True)
+class _Entry:
+    page_id: PageID
+    name: str
+    search_name: str
+    trigrams: frozenset[str]
+
+
+class PageNameIndex:
+    """Every page name of a wikia, ranked against a query as show used to in sql
+
+    An exact match wins, then one starting with the query, then one containing it, then the most similar,
+    ties go to the most similar then the shortest name.
+    """
+
+    def __init__(self):
+        self._entries: dict[PageID, _Entry] = {}
+        # (search_name, page_id) sorted, so names sharing a prefix are adjacent
+        self._names: list[tuple[str, PageID]] = []
+        self._by_trigram: dict[str, set[PageID]] = {}
+
+    def add(self, page_id: PageID, name: str, search_name: str):
+        self.remove(page_id)
+
+        entry = _Entry(page_id, name, search_name, trigrams(search_name))
+
+        self._entries[page_id] = entry
+        insort(self._names, (search_name, page_id))
+
+        for trigram in entry.trigrams:
+            self._by_trigram.setdefault(trigram, set()).add(page_id)
+
+    def remove(self, page_id: PageID):
+        entry = self._entries.pop(page_id, None)
+
+        if entry is None:
+            return
+
+        del self._names[bisect_left(self._names, (entry.search_name, page_id))]
+
+        for trigram in entry.trigrams:
+            page_ids = self._by_trigram[trigram]
+            page_ids.discard(page_id)
+
+            if not page_ids:
+                del self._by_trigram[trigram]
+
+    def resolve(self, page_name: str) -> PageID | None:
+        if not normalise_page_name(page_name):
+            return None
+
+        matches = self.matches(page_name, 1)
+
+        return matches[0] if matches else None
+
+    def name(self, page_id: PageID) -> str:
+        return self._entries[page_id].name
+
+    def matches(self, page_name: str, limit: int) -> list[PageID]:
+        """Up to limit pages matching page_name, best first
+
+        Nothing typed yet matches the first names alphabetically.
+        Each kind of match looks at no more than MAX_CANDIDATES entries, past that a better match may be missed.
+        """
+        query = normalise_page_name(page_name)
+
+        if not query:
+            return [page_id for _, page_id in self._names[:limit]]
+
+        query_trigrams = trigrams(query)
+
+        candidates = self._prefixed(query)
+
+        if len(candidates) < limit:
+            candidates += self._containing(query)
+
+        if len(candidates) < limit:
+            candidates += [
+                entry for entry in self._similar(query_trigrams)
+                if query not in entry.search_name
+            ]
+
+        def rank(entry: _Entry):
+            return (
+                entry.search_name != query,
+                not entry.search_name.startswith(query),
+                query not in entry.search_name,
+                -similarity(entry.trigrams, query_trigrams),
+                len(entry.name),
+            )
+
+        unique = {entry.page_id: entry for entry in candidates}.values()
+
+        return [entry.page_id for entry in sorted(unique, key=rank)[:limit]]
+
+    def _prefixed(self, query: str) -> list[_Entry]:
+        start = bisect_left(self._names, (query,))
+
+        entries = []
+
+        for search_name, page_id in self._names[start:start + MAX_CANDIDATES]:
+            if not search_name.startswith(query):
+                break
+
+            entries.append(self._entries[page_id])
+
+        return entries
+
+    def _containing(self, query: str) -> list[_Entry]:
+        inner = _inner_trigrams(query)
+
+        if inner:
+            # Only names holding every trigram of the query can contain it, starting from the rarest trigram
+            postings = sorted((self._by_trigram.get(trigram, set()) for trigram in inner), key=len)
+            page_ids = set(islice(postings[0], MAX_CANDIDATES)).intersection(*postings[1:])
+            entries = (self._entries[page_id] for page_id in page_ids)
+        else:
+            # Words under three letters have no trigram every containing name shares
+            entries = islice(self._entries.values(), MAX_CANDIDATES)
+
+        return [entry for entry in entries if query in entry.search_name[1:]]
+
+    def _similar(self, query_trigrams: frozenset[str]) -> list[_Entry]:
+        # A similar enough name shares at least shared of the query's trigrams
+        # So it holds one of the rarest len(query_trigrams) - shared + 1 of them, the others need not be looked up
+        shared = max(1, int(SIMILARITY_THRESHOLD * len(query_trigrams)))
+        postings = sorted((self._by_trigram.get(trigram, set()) for trigram in query_trigrams), key=len)
+        page_ids = set(islice(chain.from_iterable(postings[:len(postings) - shared + 1]), MAX_CANDIDATES))
+
+        entries = (self._entries[page_id] for page_id in page_ids)
+
+        return [entry for entry in entries if similarity(entry.trigrams, query_trigrams) >= SIMILARITY_THRESHOLD]
+
+    def __len__(self) -> int:
+        return len(self._entries)
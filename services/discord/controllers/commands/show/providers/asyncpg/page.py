@@ -1,51 +1,112 @@
 from dataclasses import dataclass
 from datetime import datetime
 import uuid
-import json
+import re
 
 from shared.asyncpg.register import Register
-from shared.asyncpg.type_coerce import type_convert_to_record
-from shared.pydantic import BaseModel
 
 from .wikia import WikiaID
 
 
-class PageField(BaseModel):
-    name: str
-    value: str
+class PageID(uuid.UUID):
+    pass
 
 
-class PageData(BaseModel):
-    title: str
-    thumbnail: dict
-    color: int
-    description: str
-    fields: list[PageField]
+@dataclass
+class FoundPage:
+    id: PageID
+    # Webhook message body showing the page, as the importer rendered it
+    embed: bytes
 
-    def get_thumbnail_url(self) -> None | str:
-        return self.thumbnail.get("url")
 
+def normalise_page_name(name: str) -> str:
+    """Lower case with every run of punctuation, underscores and spaces made a single space, as page.search_name is"""
+    return re.sub(r"[\W_]+", " ", name.lower()).strip()
 
-class PageID(uuid.UUID):
-    pass
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@dataclass
+class PageName:
+    id: PageID
+    wikia_id: WikiaID
+    name: str
+    search_name: str
+
+
+_READ = """
+select id, embed::text
+from page
+where id = $1
+"""
+
+_READ_FROM_NAME = """
+select id, embed::text
+from page
+where wikia_id = $1
+  and (search_name like $3 or search_name % $2)
+order by search_name = $2 desc,
+         search_name like $4 desc,
+         search_name like $3 desc,
+         similarity(search_name, $2) desc,
+         length(name)
+limit 1
+"""
 
 
 class PageRegister(Register):
-    async def read_from_name(self, page_name: str, wikia_id: WikiaID) -> None | PageData:
+    statements = (_READ, _READ_FROM_NAME)
+
+    async def read_names(self) -> list[PageName]:
         query = """
-        select data
+        select id, wikia_id, name, search_name
         from page
-        where name ~* $1
-          and wikia_id = $2
-        order by length(name)
         """
 
-        async with self.pool.acquire() as conn:
-            records = await conn.fetch(query, page_name, wikia_id)
-        records = type_convert_to_record(records)
+        records = await self.fetch(query)
 
-        if len(records) == 0:
+        return [
+            PageName(
+                id=record["id"],
+                wikia_id=record["wikia_id"],
+                name=record["name"],
+                search_name=record["search_name"],
+            )
+            for record in records
+        ]
+
+    async def read(self, page_id: PageID) -> None | FoundPage:
+        records = await self.fetch(_READ, page_id)
+
+        if len(records) != 1:
             return None
 
-        return PageData(**json.loads(records[0]["data"]))
+        return FoundPage(
+            id=records[0]["id"],
+            embed=records[0]["embed"].encode(),
+        )
+
+    async def read_from_name(self, page_name: str, wikia_id: WikiaID) -> None | FoundPage:
+        """Finds the page best matching page_name, ranked like PageNameIndex.matches
+
+        An exact match wins, then one starting with page_name, then one containing it, then the most similar,
+        ties go to the shortest name.
+        """
+        search_name = normalise_page_name(page_name)
+
+        if not search_name:
+            return None
+
+        escaped = _escape_like(search_name)
+
+        records = await self.fetch(_READ_FROM_NAME, wikia_id, search_name, f"%{escaped}%", f"{escaped}%")
+
+        if len(records) == 0:
+            return None
 
+        return FoundPage(
+            id=records[0]["id"],
+            embed=records[0]["embed"].encode(),
+        )
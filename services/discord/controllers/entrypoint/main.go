@@ -10,14 +10,22 @@ import (
 	"io"
 	"log"
 	"net/http"
+	"net/url"
 	"os"
+	"strings"
+	"sync"
+	"time"
 
 	"cloud.google.com/go/pubsub"
+	"google.golang.org/api/idtoken"
 )
 
 var cloudProjectID = os.Getenv("CLOUD_PROJECT_ID")
 var discordPublicKey = os.Getenv("DISCORD_PUBLIC_KEY")
 
+// Where autocomplete interactions are forwarded, {command} is replaced with the command name
+var autocompleteURLTemplate = os.Getenv("AUTOCOMPLETE_URL_TEMPLATE")
+
 type Interaction struct {
 	Type InteractionType `json:"type"`
 	Data InteractionData `json:"data"`
@@ -164,6 +172,64 @@ func runApplicationCommand(ctx context.Context, interaction Interaction, data []
 	}
 }
 
+// Discord drops an autocomplete response after 3 seconds
+const autocompleteTimeout = 2500 * time.Millisecond
+
+// Clients are shared between requests, so they are not bound to any request context
+var autocompleteClients = map[string]*http.Client{}
+var autocompleteClientsLock sync.Mutex
+
+func getAutocompleteClient(target string) (*http.Client, error) {
+	parsed, err := url.Parse(target)
+	if err != nil {
+		return nil, err
+	}
+
+	var audience = parsed.Scheme + "://" + parsed.Host
+
+	autocompleteClientsLock.Lock()
+	defer autocompleteClientsLock.Unlock()
+
+	if client, ok := autocompleteClients[audience]; ok {
+		return client, nil
+	} else if client, err := idtoken.NewClient(context.Background(), audience); err != nil {
+		return nil, err
+	} else {
+		autocompleteClients[audience] = client
+		return client, nil
+	}
+}
+
+func runAutocomplete(ctx context.Context, interaction Interaction, data []byte) (body []byte, err error) {
+	var commandName = getInteractionName(interaction, nil)
+	var target = strings.ReplaceAll(autocompleteURLTemplate, "{command}", commandName)
+
+	ctx, cancel := context.WithTimeout(ctx, autocompleteTimeout)
+	defer cancel()
+
+	if autocompleteURLTemplate == "" {
+		return nil, fmt.Errorf("autocomplete: AUTOCOMPLETE_URL_TEMPLATE is not set")
+	} else if client, err := getAutocompleteClient(target); err != nil {
+		return nil, fmt.Errorf("autocomplete: idtoken.NewClient: %v", err)
+	} else if request, err := http.NewRequestWithContext(ctx, http.MethodPost, target, bytes.NewReader(data)); err != nil {
+		return nil, fmt.Errorf("autocomplete: http.NewRequest: %v", err)
+	} else {
+		request.Header.Set("Content-Type", "application/json")
+
+		response, err := client.Do(request)
+		if err != nil {
+			return nil, fmt.Errorf("autocomplete: client.Do: %v", err)
+		}
+		defer response.Body.Close()
+
+		if response.StatusCode != http.StatusOK {
+			return nil, fmt.Errorf("autocomplete: %s responded %d", target, response.StatusCode)
+		}
+
+		return io.ReadAll(io.LimitReader(response.Body, readLimit))
+	}
+}
+
 var pubsubClient *pubsub.Client
 
 func main() {
@@ -203,6 +269,16 @@ func entryPoint(writer http.ResponseWriter, request *http.Request) {
 			writer.WriteHeader(http.StatusOK)
 			writer.Write([]byte(`{"type": 5}`))
 		}
+	} else if interaction.Type == InteractionTypes.ApplicationCommandAutoComplete {
+		// Answered straight from the command's service, a pubsub round trip would miss Discord's deadline
+		if response, err := runAutocomplete(request.Context(), interaction, body); err != nil {
+			log.Println(err)
+			writer.WriteHeader(http.StatusInternalServerError)
+		} else {
+			writer.Header().Add("Content-Type", "application/json")
+			writer.WriteHeader(http.StatusOK)
+			writer.Write(response)
+		}
 	} else {
 		writer.WriteHeader(http.StatusUnprocessableEntity)
 	}
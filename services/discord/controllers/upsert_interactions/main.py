@@ -1,10 +1,12 @@
 import asyncio
 
+import aiohttp
 from DiscordInterpythons.handlers.handler import InteractionHandlerClass
 from DiscordInterpythons.providers.application_command import ApplicationCommandAPI
 from DiscordInterpythons.models.snowflake import GuildID, ApplicationID
 
 from services.discord.shared.providers.config.yaml import load as config_load
+from services.discord.shared.providers.discord import DISCORD_API
 
 from services.discord.controllers.commands.ping import main as _
 from services.discord.controllers.commands.import_category import main as _
@@ -24,5 +26,43 @@ discord_application_command_api = ApplicationCommandAPI.from_interaction_handler
     debug_guild_id=GuildID(config.discord.debug_guild_id) if config.discord.debug_guild_id else None,
 )
 
+# Options answered by a command's autocomplete endpoint, by command name
+AUTOCOMPLETE_OPTIONS = {
+    "show": ("page_name",),
+}
 
-asyncio.run(discord_application_command_api.initialize())
+
+async def enable_autocomplete():
+    """Flags AUTOCOMPLETE_OPTIONS on the registered commands, which handler signatures can't express"""
+    commands_url = f"{DISCORD_API}/applications/{config.discord.application_id}"
+    if config.discord.debug_guild_id:
+        commands_url += f"/guilds/{config.discord.debug_guild_id}"
+    commands_url += "/commands"
+
+    headers = {"Authorization": f"Bot {config.discord.token}"}
+
+    async with aiohttp.ClientSession(headers=headers, raise_for_status=True) as session:
+        async with session.get(commands_url) as response:
+            commands = await response.json()
+
+        for command in commands:
+            option_names = AUTOCOMPLETE_OPTIONS.get(command["name"], ())
+
+            if not option_names:
+                continue
+
+            options = command.get("options", [])
+            for option in options:
+                if option["name"] in option_names:
+                    option["autocomplete"] = True
+
+            async with session.patch(f"{commands_url}/{command['id']}", json={"options": options}):
+                pass
+
+
+async def main():
+    await discord_application_command_api.initialize()
+    await enable_autocomplete()
+
+
+asyncio.run(main())
@@ -16,6 +16,48 @@ class Discord(BaseModel):
     token: str
 
 
+class Wikia(BaseModel):
+    concurrency: int = 4
+    requests_per_second: float = 2.0
+    max_requests_per_second: float = 10.0
+    cache_path: str | None = None
+    cache_ttl: float = 24 * 60 * 60
+    cache_max_bytes: int = 256 * 1024 * 1024
+    cache_offline: bool = False
+    # Processes converting pages, each a spawned interpreter of about 60MiB
+    # None uses up to DEFAULT_MAX_WORKERS of the cores this process may run on, 0 converts on the event loop
+    converter_processes: int | None = None
+    colour_cache_size: int = 4096
+    colour_cache_ttl: float = 7 * 24 * 60 * 60
+    colour_cache_max_rows: int = 100_000
+    # fast or strict, see converters.colour.ColourMode
+    colour_mode: str = "fast"
+    memo_size: int = 1024
+    memo_max_rows: int = 50_000
+    # Times every converter step and shows the slowest in the import progress
+    instrument: bool = False
+
+
+class Show(BaseModel):
+    # Page lookups kept in memory, evicted when the importer announces a page changed
+    cache_size: int = 4096
+    cache_ttl: float = 10 * 60
+
+
+class ImportJobs(BaseModel):
+    # Imports each instance runs at once
+    workers: int = 2
+    # How often idle workers look for jobs queued on other instances
+    poll_seconds: float = 5.0
+    heartbeat_seconds: float = 15.0
+    # A running job whose worker hasn't beaten for this long is resumed by another
+    stale_seconds: float = 60.0
+    max_attempts: int = 3
+
+
 class Config(BaseModel):
     database: Database
     discord: Discord
+    wikia: Wikia = Wikia()
+    show: Show = Show()
+    import_jobs: ImportJobs = ImportJobs()
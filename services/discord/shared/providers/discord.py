@@ -1,6 +1,10 @@
 import asyncio
+import json
+from dataclasses import dataclass
 from functools import wraps
+from typing import Any, Awaitable, Callable
 
+import aiohttp
 from aiohttp import web
 
 from DiscordInterpythons.handlers import handlers
@@ -37,6 +41,38 @@ def handle(func):
     return _wrapper
 
 
+DISCORD_API = "https://discord.com/api/v10"
+
+
+@dataclass
+class RawReply:
+    """A reply already serialised as a webhook message body, sent without being decoded"""
+    body: bytes
+
+
+_raw_reply_session: aiohttp.ClientSession | None = None
+
+
+async def close_raw_reply_session(_: web.Application):
+    global _raw_reply_session
+
+    if _raw_reply_session is not None:
+        await _raw_reply_session.close()
+        _raw_reply_session = None
+
+
+async def _send_raw_reply(interaction: Interaction, reply: RawReply):
+    global _raw_reply_session
+
+    if _raw_reply_session is None:
+        _raw_reply_session = aiohttp.ClientSession(raise_for_status=True)
+
+    url = f"{DISCORD_API}/webhooks/{interaction.application_id}/{interaction.token}/messages/@original"
+
+    async with _raw_reply_session.patch(url, data=reply.body, headers={"Content-Type": "application/json"}):
+        pass
+
+
 def respond(func, is_prod: bool, discord_public_key: str):
     async def _wrapper(request: web.Request) -> web.Response:
         data = await request.json()
@@ -45,6 +81,11 @@ def respond(func, is_prod: bool, discord_public_key: str):
 
         try:
             response = await func(interaction)
+
+            if isinstance(response, RawReply):
+                await _send_raw_reply(interaction, response)
+
+                return web.HTTPOk()
         except Exception as e:
             response = interaction.response.reply(f"Encountered an Unexpected Error: {e}")
 
@@ -85,6 +126,56 @@ def respond(func, is_prod: bool, discord_public_key: str):
     return _wrapper
 
 
+# Discord's limits on autocomplete choices
+MAX_CHOICES = 25
+MAX_CHOICE_LENGTH = 100
+
+
+def _focused_option(options: list[dict]) -> None | dict:
+    for option in options:
+        if option.get("focused"):
+            return option
+
+        found = _focused_option(option.get("options", []))
+        if found is not None:
+            return found
+
+    return None
+
+
+def autocomplete(
+        func: Callable[[dict, str], Awaitable[list[tuple[str, str]]]],
+        is_prod: bool,
+        discord_public_key: str,
+):
+    """Answers autocomplete interactions with the (name, value) choices func suggests for the focused option
+
+    The interaction is read as plain json, parsing it into models costs more than the lookup it feeds.
+    Names are shortened to fit, the value is what the command receives so a choice whose value does not fit is dropped.
+    """
+    async def _wrapper(request: web.Request) -> web.Response:
+        data: dict[str, Any] = json.loads(await request.read())
+
+        option = _focused_option(data["data"].get("options", []))
+
+        suggestions = [] if option is None else await func(data, str(option.get("value", "")))
+
+        return web.json_response({
+            "type": 8,
+            "data": {
+                "choices": [
+                    {"name": name[:MAX_CHOICE_LENGTH], "value": value}
+                    for name, value in suggestions
+                    if len(value) <= MAX_CHOICE_LENGTH
+                ][:MAX_CHOICES],
+            },
+        })
+
+    if not is_prod:
+        return verify(_wrapper, discord_public_key)
+    return _wrapper
+
+
 def enforce_guild_only(coro):
     @wraps(coro)
     async def _wrapper(self, interaction: Interaction, *args, **kwargs):
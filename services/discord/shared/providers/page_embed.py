@@ -0,0 +1,38 @@
+from typing import Any
+
+from shared.pydantic import BaseModel
+
+
+__all__ = (
+    "EMBED_VERSION",
+    "EmbedField",
+    "Embed",
+    "EmbedMessage",
+    "render_embed",
+)
+
+
+# Bumped whenever render_embed's output changes, pages stored with an older version are imported again
+EMBED_VERSION = 1
+
+
+class EmbedField(BaseModel):
+    name: str
+    value: str
+
+
+class Embed(BaseModel):
+    title: str
+    thumbnail: dict
+    color: int
+    description: str
+    fields: list[EmbedField]
+
+
+class EmbedMessage(BaseModel):
+    embeds: list[Embed]
+
+
+def render_embed(data: BaseModel) -> dict[str, Any]:
+    """Webhook message body showing a page's data, stored so show can send it without decoding it"""
+    return EmbedMessage(embeds=[Embed(**data.dict())]).dict()
@@ -0,0 +1,21 @@
+import uuid
+
+from shared.pydantic import BaseModel
+
+
+__all__ = (
+    "PAGE_CHANGED_CHANNEL",
+    "PageChanged",
+)
+
+
+# Postgres NOTIFY channel the importer announces written pages on
+PAGE_CHANGED_CHANNEL = "page_changed"
+
+
+class PageChanged(BaseModel):
+    wikia_id: uuid.UUID
+    page_id: uuid.UUID
+    name: str
+    search_name: str
+    created: bool
@@ -1 +1,3 @@
 from .wikia import Wikia
+from .session import get_session, open_session, close_session
+from .cache import ResponseCache, CacheMiss, open_cache, close_cache
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from hashlib import sha256
+import sqlite3
+import threading
+import time
+import zlib
+
+
+__all__ = (
+    "CachedResponse",
+    "CacheMiss",
+    "ResponseCache",
+    "get_cache",
+    "open_cache",
+    "close_cache",
+)
+
+
+class CacheMiss(LookupError):
+    pass
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    body: bytes
+    etag: str | None
+    last_modified: str | None
+    stored_at: float
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.stored_at < ttl
+
+    @property
+    def revalidation_headers(self) -> dict[str, str]:
+        headers = {}
+
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        return headers
+
+
+class ResponseCache:
+    """On disk cache of response bodies
+
+    Bodies are stored compressed and addressed by their digest, so identical responses from different urls share a blob.
+    Entries are evicted least recently used first once the stored size passes max_bytes.
+    Offline serves every stored response, record stores every response fetched, even those never served online,
+    so a run can be recorded and replayed.
+    Methods block, fetch calls them from a thread.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            ttl: float = 24 * 60 * 60,
+            max_bytes: int = 256 * 1024 * 1024,
+            offline: bool = False,
+            record: bool = False,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.record = record
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+        create table if not exists blob
+        (
+            digest text    not null primary key,
+            body   blob    not null,
+            size   integer not null
+        );
+
+        create table if not exists response
+        (
+            url           text not null primary key,
+            digest        text not null references blob,
+            etag          text,
+            last_modified text,
+            stored_at     real not null,
+            accessed_at   real not null
+        );
+
+        create index if not exists response_accessed_at_idx on response (accessed_at);
+        """)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get(self, url: str) -> CachedResponse | None:
+        with self._lock:
+            record = self._conn.execute("""
+            select blob.body, response.etag, response.last_modified, response.stored_at
+            from response
+            join blob using (digest)
+            where response.url = ?
+            """, (url,)).fetchone()
+
+            if record is None:
+                return None
+
+            body, etag, last_modified, stored_at = record
+
+            with self._conn:
+                self._conn.execute("update response set accessed_at = ? where url = ?", (time.time(), url))
+
+            return CachedResponse(
+                url=url,
+                body=zlib.decompress(body),
+                etag=etag,
+                last_modified=last_modified,
+                stored_at=stored_at,
+            )
+
+    def put(self, url: str, body: bytes, etag: str | None = None, last_modified: str | None = None):
+        with self._lock:
+            digest = sha256(body).hexdigest()
+            compressed = zlib.compress(body)
+            now = time.time()
+
+            with self._conn:
+                self._conn.execute("""
+                insert into blob(digest, body, size)
+                values(?, ?, ?)
+                on conflict (digest) do nothing
+                """, (digest, compressed, len(compressed)))
+
+                self._conn.execute("""
+                insert into response(url, digest, etag, last_modified, stored_at, accessed_at)
+                values(?, ?, ?, ?, ?, ?)
+                on conflict (url) do update
+                set digest = excluded.digest,
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    stored_at = excluded.stored_at,
+                    accessed_at = excluded.accessed_at
+                """, (url, digest, etag, last_modified, now, now))
+
+            self._evict()
+
+    def refresh(self, url: str):
+        """Marks a response as fresh again after the server confirmed it has not changed"""
+        with self._lock:
+            now = time.time()
+
+            with self._conn:
+                self._conn.execute(
+                    "update response set stored_at = ?, accessed_at = ? where url = ?",
+                    (now, now, url),
+                )
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("select coalesce(sum(size), 0) from blob").fetchone()[0]
+
+    def _evict(self):
+        size = self.size()
+        if size <= self.max_bytes:
+            return
+
+        with self._conn:
+            for url, in self._conn.execute("select url from response order by accessed_at").fetchall():
+                self._conn.execute("delete from response where url = ?", (url,))
+                size -= self._delete_orphan_blobs()
+
+                if size <= self.max_bytes:
+                    break
+
+    def _delete_orphan_blobs(self) -> int:
+        orphans = self._conn.execute("""
+        select digest, size
+        from blob
+        where not exists(select 1 from response where response.digest = blob.digest)
+        """).fetchall()
+
+        self._conn.executemany("delete from blob where digest = ?", ((digest,) for digest, _ in orphans))
+
+        return sum(size for _, size in orphans)
+
+
+_cache: ResponseCache | None = None
+
+
+def get_cache() -> ResponseCache | None:
+    return _cache
+
+
+def open_cache(
+        path: str,
+        ttl: float = 24 * 60 * 60,
+        max_bytes: int = 256 * 1024 * 1024,
+        offline: bool = False,
+        record: bool = False,
+) -> ResponseCache:
+    global _cache
+
+    close_cache()
+    _cache = ResponseCache(path, ttl=ttl, max_bytes=max_bytes, offline=offline, record=record)
+
+    return _cache
+
+
+def close_cache():
+    global _cache
+
+    if _cache is None:
+        return
+
+    cache, _cache = _cache, None
+    cache.close()
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import asyncio
+import time
+
+
+__all__ = (
+    "TokenBucket",
+    "bucket_for",
+    "parse_retry_after",
+)
+
+
+THROTTLE_STATUSES = 429, 503
+
+
+@dataclass
+class TokenBucket:
+    """Adaptive token bucket
+
+    The rate grows additively while responses are healthy and is cut multiplicatively when the host throttles us
+    """
+    rate: float = 2.0
+    min_rate: float = 0.5
+    max_rate: float = 10.0
+    capacity: float = 4.0
+    increase: float = 0.1
+    decrease: float = 0.5
+
+    _tokens: float = field(default=1.0, init=False)
+    _updated: float = field(default_factory=time.monotonic, init=False)
+    _blocked_until: float = field(default=0.0, init=False)
+    _lock: asyncio.Lock = field(default_factory=asyncio.Lock, init=False, repr=False)
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+
+                self._refill(now)
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: float | None = None):
+        now = time.monotonic()
+
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self._refill(now)
+        self._tokens = 0
+
+        if retry_after is not None:
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+
+
+_buckets: dict[str, TokenBucket] = {}
+
+
+def bucket_for(host: str, rate: float = 2.0, max_rate: float = 10.0) -> TokenBucket:
+    """Returns the bucket shared by every request to host, creating it on first use"""
+    bucket = _buckets.get(host)
+
+    if bucket is None:
+        bucket = _buckets[host] = TokenBucket(rate=rate, max_rate=max(rate, max_rate))
+
+    return bucket
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
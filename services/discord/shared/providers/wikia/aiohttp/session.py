@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import aiohttp
+from yarl import URL
+
+from .cache import CacheMiss, ResponseCache, get_cache
+from .rate_limit import THROTTLE_STATUSES, bucket_for, parse_retry_after
+
+
+__all__ = (
+    "get_session",
+    "open_session",
+    "close_session",
+    "fetch",
+    "stream",
+)
+
+
+CONNECTION_LIMIT = 32
+CONNECTION_LIMIT_PER_HOST = 8
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 30
+TIMEOUT = aiohttp.ClientTimeout(total=60, connect=10)
+RETRIES = 5
+
+
+_session: aiohttp.ClientSession | None = None
+
+
+def _create_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=CONNECTION_LIMIT,
+        limit_per_host=CONNECTION_LIMIT_PER_HOST,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+    )
+
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=TIMEOUT,
+        raise_for_status=True,
+    )
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Returns the process wide session, creating it if it was not opened on startup"""
+    global _session
+
+    if _session is None or _session.closed:
+        _session = _create_session()
+
+    return _session
+
+
+async def open_session(_=None):
+    get_session()
+
+
+async def close_session(_=None):
+    global _session
+
+    if _session is None:
+        return
+
+    session, _session = _session, None
+    await session.close()
+
+
+async def fetch(
+        url: str,
+        session: aiohttp.ClientSession | None = None,
+        rate: float = 2.0,
+        max_rate: float = 10.0,
+        cache: ResponseCache | None = None,
+        cacheable: bool = False,
+) -> bytes:
+    """Reads url through the per-host rate limiter, backing off and retrying when throttled
+
+    Only cacheable urls, whose body can't change for the url such as a revision's content or an image, are served from
+    the response cache. Others always reach the server, unless the cache is offline and replays everything it stored.
+    """
+    if cache is None:
+        cache = get_cache()
+
+    serve = cache is not None and (cacheable or cache.offline)
+    store = cache is not None and (cacheable or cache.record)
+
+    cached = await asyncio.to_thread(cache.get, url) if serve else None
+
+    if cached is not None and (cache.offline or cached.is_fresh(cache.ttl)):
+        return cached.body
+
+    if cache is not None and cache.offline:
+        raise CacheMiss(url)
+
+    session = session or get_session()
+    bucket = bucket_for(URL(url).host, rate=rate, max_rate=max_rate)
+    headers = cached.revalidation_headers if cached is not None else {}
+
+    for attempt in range(RETRIES + 1):
+        await bucket.acquire()
+
+        try:
+            async with session.get(url, headers=headers) as resp:
+                if resp.status == 304 and cached is not None:
+                    await asyncio.to_thread(cache.refresh, url)
+                    data = cached.body
+                else:
+                    data = await resp.read()
+
+                    if store:
+                        await asyncio.to_thread(
+                            cache.put, url, data, resp.headers.get("ETag"), resp.headers.get("Last-Modified"),
+                        )
+        except aiohttp.ClientResponseError as e:
+            if e.status not in THROTTLE_STATUSES or attempt == RETRIES:
+                raise
+
+            bucket.on_throttle(parse_retry_after(e.headers and e.headers.get("Retry-After")))
+            continue
+
+        bucket.on_success()
+        return data
+
+
+@asynccontextmanager
+async def stream(
+        url: str,
+        session: aiohttp.ClientSession | None = None,
+        rate: float = 2.0,
+        max_rate: float = 10.0,
+        method: str = "GET",
+        headers: dict[str, str] | None = None,
+) -> AsyncIterator[aiohttp.ClientResponse]:
+    """Opens url through the per-host rate limiter without reading the body, streamed responses are never cached"""
+    session = session or get_session()
+    bucket = bucket_for(URL(url).host, rate=rate, max_rate=max_rate)
+
+    for attempt in range(RETRIES + 1):
+        await bucket.acquire()
+
+        try:
+            resp = await session.request(method, url, headers=headers)
+        except aiohttp.ClientResponseError as e:
+            if e.status not in THROTTLE_STATUSES or attempt == RETRIES:
+                raise
+
+            bucket.on_throttle(parse_retry_after(e.headers and e.headers.get("Retry-After")))
+            continue
+
+        bucket.on_success()
+        break
+
+    async with resp:
+        yield resp
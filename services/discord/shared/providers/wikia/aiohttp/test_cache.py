@@ -0,0 +1,95 @@
+from os import urandom
+from tempfile import TemporaryDirectory
+from unittest import IsolatedAsyncioTestCase
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from services.discord.shared.providers.wikia.aiohttp import cache, close_session
+from services.discord.shared.providers.wikia.aiohttp.session import fetch
+
+
+class ResponseCacheTest(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = TemporaryDirectory()
+        self.requests = []
+
+        async def page(request: web.Request) -> web.Response:
+            self.requests.append(request.headers.get("If-None-Match"))
+
+            if request.headers.get("If-None-Match") == '"v1"':
+                return web.Response(status=304)
+
+            return web.Response(body=b"content", headers={"ETag": '"v1"'})
+
+        app = web.Application()
+        app.router.add_get("/page", page)
+
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.url = str(self.server.make_url("/page"))
+
+    async def asyncTearDown(self):
+        await close_session()
+        await self.server.close()
+        self.directory.cleanup()
+
+    def open_cache(self, **kwargs) -> cache.ResponseCache:
+        response_cache = cache.ResponseCache(f"{self.directory.name}/cache.sqlite3", **kwargs)
+        self.addCleanup(response_cache.close)
+
+        return response_cache
+
+    async def test_fresh_response_is_served_from_disk(self):
+        response_cache = self.open_cache()
+
+        self.assertEqual(await fetch(self.url, cache=response_cache, cacheable=True), b"content")
+        self.assertEqual(await fetch(self.url, cache=response_cache, cacheable=True), b"content")
+
+        self.assertEqual(self.requests, [None])
+
+    async def test_stale_response_is_revalidated(self):
+        response_cache = self.open_cache(ttl=0)
+
+        self.assertEqual(await fetch(self.url, cache=response_cache, cacheable=True), b"content")
+        self.assertEqual(await fetch(self.url, cache=response_cache, cacheable=True), b"content")
+
+        self.assertEqual(self.requests, [None, '"v1"'])
+
+    async def test_offline_miss_raises(self):
+        response_cache = self.open_cache(offline=True)
+
+        with self.assertRaises(cache.CacheMiss):
+            await fetch(self.url, cache=response_cache, cacheable=True)
+
+        self.assertEqual(self.requests, [])
+
+    async def test_uncacheable_response_is_not_served(self):
+        response_cache = self.open_cache()
+
+        self.assertEqual(await fetch(self.url, cache=response_cache), b"content")
+        self.assertEqual(await fetch(self.url, cache=response_cache), b"content")
+
+        self.assertEqual(self.requests, [None, None])
+        self.assertIsNone(response_cache.get(self.url))
+
+    async def test_recorded_uncacheable_response_is_replayed_offline(self):
+        response_cache = self.open_cache(record=True)
+        self.assertEqual(await fetch(self.url, cache=response_cache), b"content")
+        response_cache.offline = True
+
+        self.assertEqual(await fetch(self.url, cache=response_cache), b"content")
+
+        self.assertEqual(self.requests, [None])
+
+    def test_least_recently_used_is_evicted(self):
+        response_cache = self.open_cache(max_bytes=2048)
+
+        response_cache.put("https://example.com/a", urandom(768))
+        response_cache.put("https://example.com/b", urandom(768))
+        response_cache.get("https://example.com/a")
+        response_cache.put("https://example.com/c", urandom(768))
+
+        self.assertIsNotNone(response_cache.get("https://example.com/a"))
+        self.assertIsNone(response_cache.get("https://example.com/b"))
+        self.assertLessEqual(response_cache.size(), 2048)
@@ -1,10 +1,22 @@
-from unittest import IsolatedAsyncioTestCase
+from os import environ
+from unittest import IsolatedAsyncioTestCase, TestCase
+import json
 
-from services.discord.shared.providers.wikia.aiohttp import wikia
+from services.discord.shared.providers.wikia.aiohttp import wikia, close_session, open_cache, close_cache
 from services.discord.shared.providers.wikia.converters.nova_drift import converter
 
 
 class WikiaTest(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # Point WIKIA_TEST_CACHE at a cache to record into and set WIKIA_TEST_OFFLINE to replay it without the live site
+        if environ.get("WIKIA_TEST_CACHE"):
+            offline = bool(environ.get("WIKIA_TEST_OFFLINE"))
+            open_cache(environ["WIKIA_TEST_CACHE"], offline=offline, record=not offline)
+
+    async def asyncTearDown(self):
+        await close_session()
+        close_cache()
+
     async def test_read_page_from_name(self):
         nova_drift_wikia = wikia.Wikia("nova-drift")
 
@@ -20,3 +32,19 @@ class WikiaTest(IsolatedAsyncioTestCase):
         result = await nova_drift_wikia.read_page_names_from_category_name("mods")
 
         print(result)
+
+
+class ParseTextDecoderTest(TestCase):
+    def test_text_split_across_chunks(self):
+        text = '<p>Caf\u00e9 "quoted" \\ \U0001f680</p>'
+        body = json.dumps({"parse": {"title": "Antimatter Rounds", "pageid": 1, "text": text}}).encode()
+
+        for size in (1, 2, 5, len(body)):
+            with self.subTest(size=size):
+                decoder = wikia._ParseTextDecoder()
+                result = "".join(decoder.feed(body[i:i+size]) for i in range(0, len(body), size))
+
+                self.assertEqual(result, text)
+                self.assertTrue(decoder.finished)
+                self.assertEqual(decoder.metadata().title, "Antimatter Rounds")
+                self.assertEqual(decoder.metadata().pageid, 1)
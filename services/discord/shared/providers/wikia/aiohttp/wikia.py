@@ -1,12 +1,22 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator
+from urllib.parse import urlencode
 
 import asyncio
+import codecs
+import json
+import re
 import aiohttp
 
 from shared.pydantic import BaseModel
 
+from .cache import ResponseCache
+from .session import fetch, stream
+
 
 class Page(BaseModel):
     wikia: str
@@ -14,6 +24,15 @@ class Page(BaseModel):
     id: int
     text: str
     url: str
+    revision_id: int | None = None
+    touched: datetime | None = None
+
+
+class PageRevision(BaseModel):
+    title: str
+    id: int
+    revision_id: int
+    touched: datetime
 
 
 class RawPageParse(BaseModel):
@@ -35,62 +54,390 @@ class RawPage(BaseModel):
         )
 
 
-class Category(BaseModel):
-    id: int
+@dataclass
+class PageStream:
+    wikia: str
     title: str
+    id: int
     url: str
-    ns: str
+    chunks: AsyncIterator[str]
+
+
+class _ParseTextDecoder:
+    """Incrementally decodes parse.text out of an action=parse&formatversion=2 response
+
+    The title and pageid are written before the text, so they are known as soon as the text starts.
+    """
+    _TEXT_KEY = re.compile(r'"text"\s*:\s*"')
+    _STRING_BODY = re.compile(r'(?:[^"\\]+|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*')
+    _HIGH_SURROGATE = re.compile(r'\\u[dD][89abAB][0-9a-fA-F]{2}$')
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self.head = None
+        self.finished = False
+
+    @property
+    def started(self) -> bool:
+        return self.head is not None
+
+    def metadata(self) -> RawPageParse:
+        head = json.loads(f"{self.head.rstrip().rstrip(',')}}}}}")
+
+        return RawPageParse(**head["parse"], text="")
+
+    def feed(self, data: bytes) -> str:
+        if self.finished:
+            return ''
+
+        self._buffer += self._decoder.decode(data)
+
+        if self.head is None:
+            match = self._TEXT_KEY.search(self._buffer)
+            if match is None:
+                return ''
+
+            self.head = self._buffer[:match.start()]
+            self._buffer = self._buffer[match.end():]
+
+        end = self._STRING_BODY.match(self._buffer).end()
+
+        if end < len(self._buffer) and self._buffer[end] == '"':
+            self.finished = True
+        elif self._HIGH_SURROGATE.search(self._buffer, 0, end):
+            # Both halves of a surrogate pair have to be decoded together
+            end -= 6
+
+        text = json.loads(f'"{self._buffer[:end]}"')
+        self._buffer = self._buffer[end:]
+
+        return text
+
 
+class RawRevisionSlot(BaseModel):
+    content: str
 
-class RawCategory(BaseModel):
-    items: list[Category]
+
+class RawRevision(BaseModel):
+    revid: int | None
+    slots: dict[str, RawRevisionSlot]
+
+
+class RawCategoryInfo(BaseModel):
+    size: int
+    pages: int
+    files: int
+    subcats: int
+
+
+class RawQueryPage(BaseModel):
+    pageid: int | None
+    title: str
+    missing: bool = False
+    revisions: list[RawRevision] = []
+    categoryinfo: RawCategoryInfo | None
+    lastrevid: int | None
+    touched: datetime | None
+
+    def as_page(self, url: str, wikia: str) -> Page:
+        return Page(
+            wikia=wikia,
+            title=self.title,
+            id=self.pageid,
+            text=self.revisions[0].slots["main"].content,
+            url=url,
+            revision_id=self.revisions[0].revid or self.lastrevid,
+            touched=self.touched,
+        )
+
+    def as_page_revision(self) -> PageRevision:
+        return PageRevision(
+            title=self.title,
+            id=self.pageid,
+            revision_id=self.lastrevid,
+            touched=self.touched,
+        )
+
+
+class RawCategoryMember(BaseModel):
+    pageid: int
+    ns: int
+    title: str
+
+
+class RawQuery(BaseModel):
+    pages: list[RawQueryPage] = []
+    categorymembers: list[RawCategoryMember] = []
+
+
+class RawQueryResult(BaseModel):
+    query: RawQuery = RawQuery()
+    # Present when the result did not fit in one response
+    # Every key in it must be passed back to receive the rest
+    continue_: dict[str, str] | None = None
+
+    class Config:
+        fields = {"continue_": "continue"}
 
 
 @dataclass
 class Wikia:
     _BASE_URL = "https://{wikia}.fandom.com"
+    _MAX_TITLES = 50
     wikia_name: str
+    session: aiohttp.ClientSession | None = field(default=None, repr=False)
+    cache: ResponseCache | None = field(default=None, repr=False)
+    concurrency: int = 4
+    requests_per_second: float = 2.0
+    max_requests_per_second: float = 10.0
+
+    _semaphore: asyncio.Semaphore = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
 
     @property
     def api_url(self) -> str:
         return f"{self._BASE_URL.format(wikia=self.wikia_name)}/api"
 
+    async def _get_json(self, url: str, cacheable: bool = False) -> dict:
+        async with self._semaphore:
+            data = await fetch(
+                url,
+                session=self.session,
+                cache=self.cache,
+                cacheable=cacheable,
+                rate=self.requests_per_second,
+                max_rate=self.max_requests_per_second,
+            )
+
+        return json.loads(data)
+
+    def page_url(self, page_name: str) -> str:
+        return f"{self._BASE_URL.format(wikia=self.wikia_name)}/wiki/{page_name.replace(' ', '_')}"
+
+    async def _query(self, cacheable: bool = False, **params: str) -> RawQueryResult:
+        url = f"{self.api_url}.php?{urlencode({'action': 'query', 'format': 'json', 'formatversion': 2, **params})}"
+
+        return RawQueryResult(**await self._get_json(url, cacheable=cacheable))
+
+    async def _read_page_batch(self, page_names: tuple[str, ...]) -> tuple[Page, ...]:
+        params = {
+            "prop": "revisions|info",
+            "rvprop": "ids|content",
+            "rvslots": "main",
+            "rvparse": 1,
+            "titles": "|".join(page_names),
+        }
+
+        pages: dict[str, RawQueryPage] = {}
+        continue_params = {}
+        while True:
+            result = await self._query(**params, **continue_params)
+
+            for page in result.query.pages:
+                if page.missing:
+                    continue
+
+                # Large batches are split over several responses, earlier ones may omit the revisions
+                if page.revisions or page.title not in pages:
+                    pages[page.title] = page
+
+            if result.continue_ is None:
+                break
+            continue_params = result.continue_
+
+        return tuple(
+            page.as_page(url=self.page_url(page.title), wikia=self.wikia_name)
+            for page in pages.values()
+            if page.revisions
+        )
+
+    async def read_pages_from_names(
+            self,
+            page_names: tuple[str, ...],
+    ) -> tuple[Page, ...]:
+        """Reads many pages with one request per batch of titles, missing pages are omitted"""
+        batches = await asyncio.gather(*(
+            self._read_page_batch(tuple(page_names[x:x + self._MAX_TITLES]))
+            for x in range(0, len(page_names), self._MAX_TITLES)
+        ))
+
+        return tuple(page for batch in batches for page in batch)
+
+    async def _read_revision_batch(self, revisions: tuple[PageRevision, ...]) -> tuple[Page, ...]:
+        params = {
+            "prop": "revisions",
+            "rvprop": "ids|content",
+            "rvslots": "main",
+            "rvparse": 1,
+            "revids": "|".join(str(revision.revision_id) for revision in revisions),
+        }
+        touched = {revision.revision_id: revision.touched for revision in revisions}
+
+        pages: dict[int, Page] = {}
+        continue_params = {}
+        while True:
+            # A revision's content never changes, so unlike every other query these responses can be cached
+            result = await self._query(cacheable=True, **params, **continue_params)
+
+            for page in result.query.pages:
+                if page.revisions:
+                    page = page.as_page(url=self.page_url(page.title), wikia=self.wikia_name)
+                    pages[page.revision_id] = page.copy(update={"touched": touched.get(page.revision_id)})
+
+            if result.continue_ is None:
+                break
+            continue_params = result.continue_
+
+        return tuple(pages.values())
+
+    async def read_pages_from_revisions(
+            self,
+            revisions: tuple[PageRevision, ...],
+    ) -> tuple[Page, ...]:
+        """Reads the content of listed revisions with one request per batch, deleted revisions are omitted"""
+        batches = await asyncio.gather(*(
+            self._read_revision_batch(tuple(revisions[x:x + self._MAX_TITLES]))
+            for x in range(0, len(revisions), self._MAX_TITLES)
+        ))
+
+        return tuple(page for batch in batches for page in batch)
+
+    def _parse_url(self, page_name: str) -> str:
+        return f"{self.api_url}.php?action=parse&format=json&page={page_name}&prop=text&formatversion=2"
+
     async def read_page_from_name(
             self,
             page_name: str,
     ) -> Page:
-        url = f"{self.api_url}.php?action=parse&format=json&page={page_name}&prop=text&formatversion=2"
-
-        async with aiohttp.ClientSession(raise_for_status=True) as session:
-            async with session.get(url) as resp:
-                data = await resp.json()
+        data = await self._get_json(self._parse_url(page_name))
 
         return RawPage(**data).as_page(
-            url=f"{self._BASE_URL.format(wikia=self.wikia_name)}/wiki/{page_name.replace(' ', '_')}",
+            url=self.page_url(page_name),
             wikia=self.wikia_name,
         )
 
+    @asynccontextmanager
+    async def stream_page_from_name(
+            self,
+            page_name: str,
+            chunk_size: int = 64 * 1024,
+    ) -> AsyncIterator[PageStream]:
+        """Reads a page's html as it downloads, the response is released when the context exits"""
+        async with self._semaphore, stream(
+            self._parse_url(page_name),
+            session=self.session,
+            rate=self.requests_per_second,
+            max_rate=self.max_requests_per_second,
+        ) as resp:
+            decoder = _ParseTextDecoder()
+            first_text = ''
+
+            async for data in resp.content.iter_chunked(chunk_size):
+                first_text = decoder.feed(data)
+                if decoder.started:
+                    break
+
+            if not decoder.started:
+                raise ValueError(f"Response for {page_name} has no page text")
+
+            metadata = decoder.metadata()
+
+            async def _chunks() -> AsyncIterator[str]:
+                if first_text:
+                    yield first_text
+
+                async for data in resp.content.iter_chunked(chunk_size):
+                    if decoder.finished:
+                        break
+
+                    text = decoder.feed(data)
+                    if text:
+                        yield text
+
+            yield PageStream(
+                wikia=self.wikia_name,
+                title=metadata.title,
+                id=metadata.pageid,
+                url=self.page_url(page_name),
+                chunks=_chunks(),
+            )
+
     async def read_pages_from_category_name(
             self,
             category_name: str,
     ) -> tuple[Page, ...]:
         page_names = await self.read_page_names_from_category_name(category_name)
 
-        results = []
-        for page_name in page_names:
-            results.append(await self.read_page_from_name(page_name=page_name))
-            await asyncio.sleep(0.5)
+        return await self.read_pages_from_names(page_names)
 
-        return tuple(results)
+    async def iter_page_names_from_category_name(
+            self,
+            category_name: str,
+    ) -> AsyncIterator[str]:
+        """Yields the names of every page in a category, one listing request at a time"""
+        params = {
+            "list": "categorymembers",
+            "cmtitle": f"Category:{category_name}",
+            "cmtype": "page",
+            "cmlimit": 500,
+        }
+
+        continue_params = {}
+        while True:
+            result = await self._query(**params, **continue_params)
+
+            for member in result.query.categorymembers:
+                yield member.title
+
+            if result.continue_ is None:
+                break
+            continue_params = result.continue_
+
+    async def iter_page_revisions_from_category_name(
+            self,
+            category_name: str,
+    ) -> AsyncIterator[PageRevision]:
+        """Yields the latest revision of every page in a category without reading any page content"""
+        params = {
+            "generator": "categorymembers",
+            "gcmtitle": f"Category:{category_name}",
+            "gcmtype": "page",
+            "gcmlimit": 500,
+            "prop": "info",
+        }
+
+        continue_params = {}
+        while True:
+            result = await self._query(**params, **continue_params)
+
+            for page in result.query.pages:
+                if not page.missing:
+                    yield page.as_page_revision()
+
+            if result.continue_ is None:
+                break
+            continue_params = result.continue_
 
     async def read_page_names_from_category_name(
             self,
             category_name: str,
     ) -> tuple[str, ...]:
-        url = f"{self.api_url}/api/v1/Articles/List?category={category_name}&from=R&limit=1000"
+        return tuple([
+            page_name
+            async for page_name in self.iter_page_names_from_category_name(category_name)
+        ])
+
+    async def read_category_size(
+            self,
+            category_name: str,
+    ) -> int:
+        result = await self._query(prop="categoryinfo", titles=f"Category:{category_name}")
 
-        async with aiohttp.ClientSession(raise_for_status=True) as session:
-            async with session.get(url) as resp:
-                data = await resp.json()
+        for page in result.query.pages:
+            if page.categoryinfo is not None:
+                return page.categoryinfo.pages
 
-        return tuple(i.title for i in RawCategory(**data).items)
+        return 0
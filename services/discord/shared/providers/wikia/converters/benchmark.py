@@ -0,0 +1,103 @@
+"""Times a converter over saved pages
+
+python -m services.discord.shared.providers.wikia.converters.benchmark page.html [page.html ...]
+
+Pages are the html of a parse response's text, the file name is used as the title.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import argparse
+import asyncio
+import time
+
+from services.discord.shared.providers.wikia.aiohttp import close_session, open_cache, close_cache
+from services.discord.shared.providers.wikia.aiohttp.wikia import Page
+from services.discord.shared.providers.wikia.converters import convert_strategy, nova_drift
+from services.discord.shared.providers.wikia.converters.executor import start_executor, close_executor
+from services.discord.shared.providers.wikia.converters.instrumentation import PageReport, RunReport
+
+
+CONVERTERS = {
+    "nova-drift": nova_drift.HANDLERS,
+}
+
+
+def _read_pages(paths: list[str], wikia: str) -> list[Page]:
+    pages = []
+
+    for path in map(Path, paths):
+        pages.append(Page(
+            wikia=wikia,
+            title=path.stem,
+            id=0,
+            text=path.read_text(),
+            url=f"https://{wikia}.fandom.com/wiki/{path.stem}",
+        ))
+
+    return pages
+
+
+async def run(
+        pages: list[Page],
+        handlers: convert_strategy.HandlerFuncs,
+        repeat: int,
+        concurrency: int,
+) -> tuple[RunReport, float]:
+    run_report = RunReport()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _convert(page: Page):
+        async with semaphore:
+            report = PageReport(page.title)
+            await convert_strategy.behaviour(handlers, page, report=report)
+            run_report.add(report)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_convert(page) for _ in range(repeat) for page in pages))
+
+    return run_report, time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pages", nargs="+")
+    parser.add_argument("--wikia", default="nova-drift", choices=CONVERTERS)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--processes", type=int, default=0, help="converter pool size, 0 converts on the loop")
+    parser.add_argument("--no-colour", action="store_true", help="skip handler_find_colour and its image download")
+    parser.add_argument("--cache", help="response cache to read images from")
+    args = parser.parse_args()
+
+    handlers = CONVERTERS[args.wikia]
+    if args.no_colour:
+        handlers = tuple(i for i in handlers if i is not convert_strategy.handler_find_colour)
+
+    if args.cache:
+        open_cache(args.cache)
+
+    start_executor(args.processes)
+
+    try:
+        run_report, elapsed = await run(_read_pages(args.pages, args.wikia), handlers, args.repeat, args.concurrency)
+    finally:
+        await close_executor()
+        await close_session()
+        close_cache()
+
+    print(f"{run_report.pages} pages in {elapsed:.2f}s, {run_report.pages / elapsed:.1f} pages/s")
+    print(f"{run_report.bytes_parsed / 1024 / 1024:.1f}MiB parsed, {run_report.image_download:.2f}s downloading images")
+    print()
+    width = max(len(i) for i in run_report.stages)
+    print(f"{'stage':<{width}} {'wall':>9} {'cpu':>9} {'nodes in':>9} {'nodes out':>9}")
+
+    for stage in run_report.stages.values():
+        print(
+            f"{stage.name:<{width}} {stage.wall:>8.3f}s {stage.cpu:>8.3f}s "
+            f"{stage.nodes_before / run_report.pages:>9.1f} {stage.nodes_after / run_report.pages:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from enum import Enum
+from urllib.parse import urlsplit, urlunsplit
+import io
+
+from PIL import Image, ImageStat
+
+try:
+    import numpy as _np
+except ImportError:
+    _np = None
+
+
+__all__ = (
+    "ColourMode",
+    "THUMBNAIL_WIDTH",
+    "colour_source_url",
+    "median_colour",
+)
+
+
+# Wide enough that the median of the centre crop matches the full size image within a step or two
+THUMBNAIL_WIDTH = 64
+
+_CROP = 0.25
+
+
+class ColourMode(str, Enum):
+    # Median of the centre of a server scaled thumbnail
+    FAST = "fast"
+    # The original full size path, kept to compare colours against ones stored before FAST existed
+    STRICT = "strict"
+
+
+def colour_source_url(url: str, mode: ColourMode) -> str:
+    """Returns the url of the image to download for url's colour"""
+    if mode == ColourMode.STRICT:
+        return url
+
+    scheme, netloc, path, query, fragment = urlsplit(url)
+
+    return urlunsplit((scheme, netloc, f"{path.rstrip('/')}/scale-to-width-down/{THUMBNAIL_WIDTH}", query, fragment))
+
+
+def median_colour(data: bytes, mode: ColourMode = ColourMode.FAST) -> tuple[int, int, int]:
+    """Returns the per band median of the centre of the image in data"""
+    if mode == ColourMode.STRICT:
+        return _strict_median_colour(data)
+
+    im = Image.open(io.BytesIO(data))
+
+    if im.format == "JPEG":
+        # Lets libjpeg decode at a fraction of the size instead of scaling afterwards
+        im.draft("RGB", (THUMBNAIL_WIDTH, THUMBNAIL_WIDTH))
+
+    im = im.convert("RGB")
+
+    factor = min(im.width, im.height) // THUMBNAIL_WIDTH
+    if factor > 1:
+        im = im.reduce(factor)
+
+    im = im.crop((
+        int(im.width * _CROP),
+        int(im.height * _CROP),
+        int(im.width * (1 - _CROP)),
+        int(im.height * (1 - _CROP)),
+    ))
+
+    if _np is None:
+        return tuple(ImageStat.Stat(im)._getmedian())
+
+    # Same element ImageStat picks, the one past half of the pixels
+    pixels = _np.asarray(im).reshape(-1, 3)
+    half = len(pixels) // 2
+
+    return tuple(int(i) for i in _np.partition(pixels, half, axis=0)[half])
+
+
+def _strict_median_colour(data: bytes) -> tuple[int, int, int]:
+    im = Image.open(io.BytesIO(data)).convert("RGB")
+
+    # The width and height are swapped for the far corner, which crops non square images off centre
+    im = im.crop((
+        int(im.width * _CROP),
+        int(im.height * _CROP),
+        int(im.height * (1 - _CROP)),
+        int(im.width * (1 - _CROP)),
+    ))
+
+    return tuple(ImageStat.Stat(im)._getmedian())
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Protocol
+from urllib.parse import urlsplit, urlunsplit
+import asyncio
+import re
+
+from services.discord.shared.providers.wikia.aiohttp.session import stream
+from shared.cache import LRUCache
+
+
+__all__ = (
+    "Colour",
+    "ImageColour",
+    "ColourStore",
+    "ColourCache",
+    "normalise_image_url",
+    "get_colour_cache",
+    "open_colour_cache",
+    "close_colour_cache",
+)
+
+
+Colour = tuple[int, int, int]
+
+
+# Fandom serves resized copies of an image under extra path segments, e.g. .../revision/latest/scale-to-width-down/268
+_SCALED_SEGMENTS = re.compile(r"/(?:scale-to-width-down|scale-to-width|scale-to-height-down|smart|thumbnail)(?:/[^/]+)*$")
+
+
+def normalise_image_url(url: str) -> str:
+    """Returns the url of the original image, dropping resizing segments and the query string"""
+    scheme, netloc, path, _, _ = urlsplit(url)
+
+    return urlunsplit((scheme, netloc, _SCALED_SEGMENTS.sub("", path), "", ""))
+
+
+@dataclass
+class ImageColour:
+    url: str
+    etag: str | None
+    colour: Colour
+    checked_at: datetime
+
+    def is_fresh(self, ttl: timedelta) -> bool:
+        return datetime.now(timezone.utc) - self.checked_at < ttl
+
+
+class ColourStore(Protocol):
+    async def read(self, url: str) -> ImageColour | None:
+        ...
+
+    async def write(self, image_colour: ImageColour):
+        ...
+
+
+class ColourCache:
+    """Median colours of images keyed by their normalised url
+
+    Entries are kept in memory and in store, once older than ttl they are revalidated against the image's ETag.
+    Concurrent reads of one image share a single download.
+    """
+
+    def __init__(
+            self,
+            store: ColourStore | None = None,
+            maxsize: int = 4096,
+            ttl: timedelta = timedelta(days=7),
+    ):
+        self.store = store
+        self.ttl = ttl
+
+        self._memory: LRUCache[str, ImageColour] = LRUCache(maxsize)
+        self._pending: dict[str, asyncio.Future[Colour]] = {}
+
+    async def read(
+            self,
+            url: str,
+            compute: Callable[[bytes], Awaitable[Colour]],
+            variant: str | None = None,
+    ) -> Colour:
+        """Returns the colour compute gives for the image at url, variant separates colours computed differently"""
+        key = normalise_image_url(url)
+        if variant:
+            key = f"{key}#{variant}"
+
+        task = self._pending.get(key)
+
+        if task is None:
+            task = self._pending[key] = asyncio.ensure_future(self._read(key, url, compute))
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+
+        # Shielded so one cancelled caller does not cancel the download for the others
+        return await asyncio.shield(task)
+
+    async def _read(self, key: str, url: str, compute: Callable[[bytes], Awaitable[Colour]]) -> Colour:
+        cached = self._memory.get(key)
+
+        if cached is None and self.store is not None:
+            cached = await self.store.read(key)
+
+        if cached is not None and cached.is_fresh(self.ttl):
+            self._memory.set(key, cached)
+            return cached.colour
+
+        headers = {"If-None-Match": cached.etag} if cached is not None and cached.etag else None
+
+        async with stream(url, headers=headers) as resp:
+            unchanged = resp.status == 304
+            data = None if unchanged else await resp.read()
+            etag = resp.headers.get("ETag")
+
+        if unchanged:
+            image_colour = replace(cached, checked_at=datetime.now(timezone.utc))
+        else:
+            image_colour = ImageColour(
+                url=key,
+                etag=etag,
+                colour=tuple(await compute(data)),
+                checked_at=datetime.now(timezone.utc),
+            )
+
+        self._memory.set(key, image_colour)
+
+        if self.store is not None:
+            await self.store.write(image_colour)
+
+        return image_colour.colour
+
+
+_colour_cache: ColourCache | None = None
+
+
+def get_colour_cache() -> ColourCache | None:
+    return _colour_cache
+
+
+def open_colour_cache(
+        store: ColourStore | None = None,
+        maxsize: int = 4096,
+        ttl: timedelta = timedelta(days=7),
+) -> ColourCache:
+    global _colour_cache
+
+    _colour_cache = ColourCache(store, maxsize=maxsize, ttl=ttl)
+
+    return _colour_cache
+
+
+def close_colour_cache():
+    global _colour_cache
+
+    _colour_cache = None
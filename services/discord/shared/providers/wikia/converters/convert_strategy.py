@@ -1,14 +1,15 @@
+from concurrent.futures import Executor
 from dataclasses import dataclass, field
+from datetime import datetime
 import asyncio
-import io
-from typing import Callable, Coroutine, Any
+import re
+import time
+from typing import AsyncIterator, Callable, Coroutine, Any
 from pydantic import Json
 
-from PIL import Image, ImageStat
-import aiohttp
-
 from services.discord.shared.providers.wikia.converters.parser import (
     Handler,
+    HTMLTag,
     Url,
     Dl,
     Td,
@@ -16,9 +17,22 @@ from services.discord.shared.providers.wikia.converters.parser import (
     H2,
     Extra,
 )
-from services.discord.shared.providers.wikia.aiohttp.wikia import Page
+from services.discord.shared.providers.wikia.aiohttp.wikia import Page, PageStream
+from services.discord.shared.providers.wikia.aiohttp.session import fetch
 from shared.pydantic import BaseModel
 from services.discord.shared.providers.wikia.converters.parser import PreciseHTMLParser
+from services.discord.shared.providers.wikia.converters.executor import get_executor, run_in_executor
+from services.discord.shared.providers.wikia.converters.colour import ColourMode, colour_source_url, median_colour
+from services.discord.shared.providers.wikia.converters.colour_cache import get_colour_cache
+from services.discord.shared.providers.wikia.converters.pipeline import compile_handlers, node_handler
+from services.discord.shared.providers.wikia.converters.memo import content_key, get_memo
+from services.discord.shared.providers.wikia.converters.instrumentation import (
+    PageReport,
+    StageTiming,
+    current_report,
+    timed,
+    timed_async,
+)
 
 
 
@@ -42,76 +56,111 @@ class ConvertedPage(BaseModel):
     name: str
     data: Json[PageData] | PageData
     url: str
+    revision_id: int | None = None
+    touched: datetime | None = None
 
 
 def handler_trim(content: Handler, page: ConvertedPage):
     # Trim
-    content.n = content.n[9:]
+    del content.n[:9]
 
 
-def handler_trim_empty_tags(content: Handler, page: ConvertedPage):
-    content.filter(lambda x: x and not isinstance(x, Dl))
+@node_handler
+def handler_trim_empty_tags(node: HTMLTag, page: ConvertedPage, state: dict) -> HTMLTag | None:
+    if node and not isinstance(node, Dl):
+        return node
 
 
 def handler_trim_before_content(content: Handler, page: ConvertedPage):
     for x, i in enumerate(content.n):
         if isinstance(i, H2) and i[0] == "Contents":
-            content.n = content.n[x+2:]
+            del content.n[:x+2]
             break
 
 
 def handler_merge_td_into_li(content: Handler, page: ConvertedPage):
+    # Merged nodes used to be removed while iterating, which skipped as many of the following nodes as were removed
+    # The skip is kept so converted pages stay the same
     list_objects = []
-    for i in content.n:
-        if isinstance(i, (Td, Li)):
-            list_objects.append(i)
+    skip = 0
+    for x, i in enumerate(content.n):
+        if skip:
+            skip -= 1
+        elif isinstance(i, (Td, Li)):
+            list_objects.append(x)
         elif len(list_objects) == 1:
             list_objects = []
         elif list_objects:
-            new_li = list_objects[0]
-            for i in list_objects[1:]:
-                content.n.remove(i)
-                for j in i:
+            new_li = content.n[list_objects[0]]
+            for y in list_objects[1:]:
+                for j in content.n[y]:
                     new_li.append(j)
+                content.discard(y)
+
+            skip = len(list_objects) - 1
             list_objects = []
 
-def handler_remove_leftover_td(content: Handler, page: ConvertedPage):
-    for i in content.n:
-        if isinstance(i, Td):
-            content.n.remove(i)
+    content.compact()
 
-def handler_join_li_semicolons(content: Handler, page: ConvertedPage):
-    for x, i in enumerate(content.n):
-        if isinstance(i, Li):
-            new_li = Li()
-            for y, val in enumerate(i):
-                if len(val) > 3 and val[0] == "[" and val[2] == "]":
-                    val = val[3:]
-
-                if new_li and (new_li[-1].endswith(":")):
-                    new_li[-1] += f" {val}"
-                elif new_li and (val.startswith("'")):
-                    new_li[-1] += val
-                elif new_li and (val.startswith("[") and val.endswith("]")):
-                    continue
-                elif new_li and val.startswith("."):
-                    new_li[-1] += val
-                else:
-                    new_li.append(val)
-            content.n[x] = new_li
 
+@node_handler
+def handler_remove_leftover_td(node: HTMLTag, page: ConvertedPage, state: dict) -> HTMLTag | None:
+    # As above, the node following a removed one is skipped
+    if state.pop("skip", False):
+        return node
 
-def handler_collapse_ext(content: Handler, page: ConvertedPage):
-    drop = []
-    for x, i in enumerate(content.n):
-        if x and isinstance(i, Extra):
-            content.n[x-1][-1]+= i[0]
-            drop.append(x)
-        elif not x and isinstance(i, Extra):
-            content.n[0] = H2(("Stats", ))
+    if isinstance(node, Td):
+        state["skip"] = True
+        return None
+
+    return node
+
+
+@node_handler
+def handler_join_li_semicolons(node: HTMLTag, page: ConvertedPage, state: dict) -> HTMLTag | None:
+    if not isinstance(node, Li):
+        return node
+
+    new_li = Li()
+    for val in node:
+        if len(val) > 3 and val[0] == "[" and val[2] == "]":
+            val = val[3:]
+
+        if new_li and (new_li[-1].endswith(":")):
+            new_li[-1] += f" {val}"
+        elif new_li and (val.startswith("'")):
+            new_li[-1] += val
+        elif new_li and (val.startswith("[") and val.endswith("]")):
+            continue
+        elif new_li and val.startswith("."):
+            new_li[-1] += val
+        else:
+            new_li.append(val)
 
-    for x, i in enumerate(drop):
-        content.n.pop(i-x)
+    return new_li
+
+
+def _flush_collapse_ext(page: ConvertedPage, state: dict) -> HTMLTag | None:
+    return state.get("held")
+
+
+@node_handler(flush=_flush_collapse_ext)
+def handler_collapse_ext(node: HTMLTag, page: ConvertedPage, state: dict) -> HTMLTag | None:
+    # Loose text is joined onto the node before it, even when that node was loose text dropped the same way
+    # The last kept node is held back until the next one arrives, as loose text after it may still change it
+    previous = state.get("previous")
+    state["previous"] = node
+
+    if previous is not None and isinstance(node, Extra):
+        previous[-1] += node[0]
+        return None
+
+    if previous is None and isinstance(node, Extra):
+        node = H2(("Stats", ))
+        state["previous"] = node
+
+    held, state["held"] = state.get("held"), node
+    return held
 
 
 def handler_find_image(content: Handler, page: ConvertedPage):
@@ -185,64 +234,341 @@ def handler_find_fields(content: Handler, page: ConvertedPage):
         )
 
 
-async def behaviour(
-        funcs: tuple[
-            Callable[
-                [Handler, Page],
-                Coroutine[Any, Any, None]
-            ] | Callable[
-                [Handler, Page],
-                None
-            ], ...],
-        page: Page,
-) -> Page:
-    text = page.text
-
-    text = text[:text.index('<!--')]
-
-    text = text.rstrip()
-    text = text.replace('\\t', '').replace('\\n', '')
-
-    handler = PreciseHTMLParser().feed(text)
-
-    store_page = ConvertedPage(
-        name=page.title,
+HandlerFuncs = tuple[
+    Callable[
+        [Handler, Page],
+        Coroutine[Any, Any, None]
+    ] | Callable[
+        [Handler, Page],
+        None
+    ], ...]
+
+
+def _new_page(
+        title: str,
+        url: str,
+        revision_id: int | None = None,
+        touched: datetime | None = None,
+) -> ConvertedPage:
+    return ConvertedPage(
+        name=title,
         data=PageData(
-            title=f"**{page.title.upper().replace('_', ' ')}**",
+            title=f"**{title.upper().replace('_', ' ')}**",
             thumbnail="",
             color=0,
-            description=f"[Wikia Page]({page.url})",
+            description=f"[Wikia Page]({url})",
             fields=[],
         ),
-        url=page.url,
+        url=url,
+        revision_id=revision_id,
+        touched=touched,
     )
 
+
+def _clean_text(text: str) -> str:
+    return text.replace('\\t', '').replace('\\n', '')
+
+
+# action=parse ends the page with the parser's limit report, rvparse output has no trailer
+# Comments anywhere else are skipped by the tokenizer
+_LIMIT_REPORT = re.compile(r'<!--\s*NewPP limit report')
+_LIMIT_REPORT_HEAD = '<!--'
+_LIMIT_REPORT_TITLE = 'NewPP limit report'
+
+
+def _strip_limit_report(text: str) -> str:
+    match = _LIMIT_REPORT.search(text)
+
+    return text if match is None else text[:match.start()]
+
+
+def _may_start_limit_report(text: str) -> bool:
+    """Whether more text could turn this into the limit report"""
+    if len(text) <= len(_LIMIT_REPORT_HEAD):
+        return _LIMIT_REPORT_HEAD.startswith(text)
+
+    return (
+            text.startswith(_LIMIT_REPORT_HEAD)
+            and _LIMIT_REPORT_TITLE.startswith(text[len(_LIMIT_REPORT_HEAD):].lstrip())
+    )
+
+
+def _parse(text: str) -> Handler:
+    text = _strip_limit_report(text)
+
+    text = text.rstrip()
+    text = _clean_text(text)
+
+    parser = PreciseHTMLParser()
+    parser.feed(text)
+    return parser.close()
+
+
+def _run_sync_handlers(
+        funcs: HandlerFuncs,
+        content: Handler | str,
+        page: ConvertedPage,
+        instrumented: bool = False,
+) -> tuple[Handler, ConvertedPage, list[StageTiming] | None]:
+    """Parses content if it is still text and runs funcs over it, timing each step when instrumented"""
+    if not instrumented:
+        if isinstance(content, str):
+            content = _parse(content)
+
+        for func in funcs:
+            func(content, page)
+
+        return content, page, None
+
+    timings = []
+
+    if isinstance(content, str):
+        content, timing = timed("parse", _parse, content)
+        timings.append(timing)
+
     for func in funcs:
-        if asyncio.iscoroutinefunction(func):
-            await func(handler, store_page)
+        _, timing = timed(func.__name__, func, content, page)
+        timings.append(timing)
+
+    return content, page, timings
+
+
+def _convert_text(
+        funcs: HandlerFuncs,
+        text: str,
+        page: ConvertedPage,
+        instrumented: bool = False,
+) -> tuple[ConvertedPage, list[StageTiming] | None]:
+    """_run_sync_handlers for a worker process, only the text goes in and only the page comes out, as both are pickled"""
+    _, page, timings = _run_sync_handlers(funcs, text, page, instrumented)
+
+    return page, timings
+
+
+def _split_stages(funcs: HandlerFuncs) -> list[tuple[bool, HandlerFuncs]]:
+    """Groups consecutive handlers that are both sync or both async"""
+    stages = []
+
+    for func in funcs:
+        is_async = asyncio.iscoroutinefunction(func)
+
+        if stages and stages[-1][0] == is_async:
+            stages[-1] = is_async, (*stages[-1][1], func)
+        else:
+            stages.append((is_async, (func,)))
+
+    return stages
+
+
+async def _run_handlers(
+        funcs: HandlerFuncs,
+        content: Handler | str,
+        page: ConvertedPage,
+        executor: Executor | None = None,
+        report: PageReport | None = None,
+) -> ConvertedPage:
+    instrumented = report is not None
+
+    if instrumented:
+        token = current_report.set(report)
+
+        if isinstance(content, str):
+            report.bytes_parsed += len(content.encode())
+
+    try:
+        funcs = compile_handlers(funcs)
+
+        if executor is not None and isinstance(content, str):
+            # The tree never crosses to the worker, which runs every sync handler from the text and returns the page
+            # The async handlers then run on the loop without the tree
+            page, timings = await run_in_executor(
+                executor,
+                _convert_text,
+                tuple(func for func in funcs if not asyncio.iscoroutinefunction(func)),
+                content,
+                page,
+                instrumented,
+            )
+
+            if instrumented:
+                report.stages.extend(timings)
+
+            content = None
+            stages = [(True, tuple(func for func in funcs if asyncio.iscoroutinefunction(func)))]
         else:
-            func(handler, store_page)
+            # A tree that is already parsed is never sent to a worker
+            executor = None
+            stages = _split_stages(funcs)
+
+        for is_async, stage in stages:
+            if not is_async or isinstance(content, str):
+                # Async handlers need the page parsed first
+                content, page, timings = await run_in_executor(
+                    executor, _run_sync_handlers, () if is_async else stage, content, page, instrumented,
+                )
+
+                if instrumented:
+                    report.stages.extend(timings)
+
+            if not is_async:
+                continue
+
+            for func in stage:
+                if instrumented:
+                    _, timing = await timed_async(func.__name__, func, content, page)
+                    report.stages.append(timing)
+                else:
+                    await func(content, page)
+    finally:
+        if instrumented:
+            current_report.reset(token)
+
+    return page
+
+
+async def behaviour(
+        funcs: HandlerFuncs,
+        page: Page,
+        executor: Executor | None = None,
+        report: PageReport | None = None,
+) -> ConvertedPage:
+    """Converts page, parsing and the sync handlers run in executor or the converter pool if one was started
+
+    In a pool every sync handler runs before the async ones, which are then given no tree.
+
+    When report is given it is filled in with how long each step took.
+    """
+    return await _run_handlers(
+        funcs,
+        page.text,
+        _new_page(page.title, page.url, page.revision_id, page.touched),
+        executor or get_executor(),
+        report,
+    )
+
+
+@dataclass(frozen=True)
+class Converter:
+    """A wikia's handlers, bump version whenever a change to them changes the pages they convert
+
+    A streamed page stops downloading once the h2 heading named terminal_section is parsed.
+    """
+    wikia: str
+    version: int
+    handlers: HandlerFuncs
+    terminal_section: str | None = None
+
+    async def __call__(self, page: Page, report: PageReport | None = None) -> ConvertedPage:
+        """Converts page, returning the earlier result when this version already converted the same content"""
+        memo = get_memo()
+        if memo is None:
+            return await behaviour(self.handlers, page, report=report)
+
+        key = content_key(page, _colour_mode.value)
+
+        converted = await memo.read(key, self.wikia, self.version)
+        if converted is not None:
+            if report is not None:
+                report.memo_hit = True
+
+            return converted.copy(update={"revision_id": page.revision_id, "touched": page.touched})
+
+        converted = await behaviour(self.handlers, page, report=report)
+        await memo.write(key, self.wikia, self.version, converted)
 
-    return store_page
+        return converted
+
+    async def stream(self, page: PageStream, report: PageReport | None = None) -> ConvertedPage:
+        return await behaviour_stream(self.handlers, page, self.terminal_section, report)
+
+
+async def _parse_stream(chunks: AsyncIterator[str], terminal_section: str | None = None) -> Handler:
+    """Feeds the page to the parser as it downloads, giving the same tree as parsing the whole text
+
+    Only text ending right before a tag is fed, so no run of text is split between two feeds.
+    Everything from the limit report on is dropped, like behaviour does.
+    """
+    parser = PreciseHTMLParser(terminal_section=terminal_section)
+    buffer = ''
+
+    async for chunk in chunks:
+        buffer += chunk
+
+        match = _LIMIT_REPORT.search(buffer)
+        if match is not None:
+            buffer = buffer[:match.start()]
+            break
+
+        cut = buffer.rfind('<')
+        if cut != -1 and _may_start_limit_report(buffer[cut:]):
+            # This may be the start of the limit report, the text before it has to be held back to be stripped
+            cut = buffer.rfind('<', 0, cut)
+
+        if cut > 0:
+            parser.feed(_clean_text(buffer[:cut]))
+            buffer = buffer[cut:]
+
+            if parser.done:
+                return parser.close()
+
+    parser.feed(_clean_text(buffer.rstrip()))
+
+    return parser.close()
+
+
+async def behaviour_stream(
+        funcs: HandlerFuncs,
+        page: PageStream,
+        terminal_section: str | None = None,
+        report: PageReport | None = None,
+) -> ConvertedPage:
+    """behaviour for a page that is still downloading, parsing stops at terminal_section when it is given"""
+    if report is None:
+        handler = await _parse_stream(page.chunks, terminal_section)
+    else:
+        handler, timing = await timed_async("parse", _parse_stream, page.chunks, terminal_section)
+        report.stages.append(timing)
+
+    return await _run_handlers(funcs, handler, _new_page(page.title, page.url), get_executor(), report)
+
+
+_colour_mode = ColourMode.FAST
+
+
+def set_colour_mode(mode: ColourMode):
+    global _colour_mode
+
+    _colour_mode = ColourMode(mode)
 
 
 async def _get_avg_colour(url: str) -> tuple[int, int, int]:
-    """Requests image from url and returns it as BytesIO"""
-    async with aiohttp.ClientSession(raise_for_status=True) as session:
-        async with session.get(url) as resp:
-            byte_io = io.BytesIO(await resp.read())
-
-    im = Image.open(byte_io).convert("RGB")
-
-    mult = 0.25
-    im = im.crop((
-        int(im.width * mult),
-        int(im.height * mult),
-        int(im.height * (1 - mult)),
-        int(im.width * (1 - mult)),
-    ))
-
-    return ImageStat.Stat(im)._getmedian()
+    """Returns the median colour of the image at url, only downloading it when the colour cache has no fresh entry"""
+    mode = _colour_mode
+    source_url = colour_source_url(url, mode)
+    compute_time = 0.0
+
+    async def compute(data: bytes) -> tuple[int, int, int]:
+        nonlocal compute_time
+
+        start = time.perf_counter()
+        try:
+            return await run_in_executor(get_executor(), median_colour, data, mode)
+        finally:
+            compute_time += time.perf_counter() - start
+
+    start = time.perf_counter()
+    colour_cache = get_colour_cache()
+
+    if colour_cache is not None:
+        colour = await colour_cache.read(source_url, compute, variant=mode.value)
+    else:
+        colour = await compute(await fetch(source_url, cacheable=True))
+
+    report = current_report.get()
+    if report is not None:
+        report.image_download += time.perf_counter() - start - compute_time
+
+    return colour
 
 
 def _rgb2hex(rgb: tuple[int, int, int]):
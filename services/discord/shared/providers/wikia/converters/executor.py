@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, TypeVar
+import asyncio
+import multiprocessing
+import os
+
+
+__all__ = (
+    "DEFAULT_MAX_WORKERS",
+    "get_executor",
+    "start_executor",
+    "close_executor",
+    "run_in_executor",
+)
+
+
+T = TypeVar("T")
+
+
+# Each worker costs a whole interpreter, a small instance has room for few of them
+DEFAULT_MAX_WORKERS = 2
+
+
+_executor: Executor | None = None
+
+
+def get_executor() -> Executor | None:
+    return _executor
+
+
+def start_executor(max_workers: int | None = None) -> Executor | None:
+    """Starts the process wide converter pool, 0 converts on the loop
+
+    max_workers defaults to DEFAULT_MAX_WORKERS, or fewer when this process may run on fewer cores.
+    """
+    global _executor
+
+    _shutdown()
+
+    if max_workers == 0:
+        return None
+
+    # Workers are spawned, forking a process running an event loop and threads is not safe
+    _executor = ProcessPoolExecutor(
+        max_workers=max_workers or min(DEFAULT_MAX_WORKERS, len(os.sched_getaffinity(0))),
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+    return _executor
+
+
+async def close_executor(_=None):
+    _shutdown()
+
+
+def _shutdown():
+    global _executor
+
+    if _executor is None:
+        return
+
+    executor, _executor = _executor, None
+    executor.shutdown(cancel_futures=True)
+
+
+async def run_in_executor(executor: Executor | None, func: Callable[..., T], *args) -> T:
+    """Runs func in executor, or directly on the loop when there is no executor"""
+    if executor is None:
+        return func(*args)
+
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
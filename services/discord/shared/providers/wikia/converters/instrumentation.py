@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+import time
+
+
+__all__ = (
+    "StageTiming",
+    "PageReport",
+    "RunReport",
+    "current_report",
+    "timed",
+    "timed_async",
+)
+
+
+@dataclass
+class StageTiming:
+    name: str
+    wall: float = 0.0
+    cpu: float = 0.0
+    nodes_before: int = 0
+    nodes_after: int = 0
+
+    def add(self, other: StageTiming):
+        self.wall += other.wall
+        self.cpu += other.cpu
+        self.nodes_before += other.nodes_before
+        self.nodes_after += other.nodes_after
+
+
+@dataclass
+class PageReport:
+    """Where the time converting one page went, passing one to a converter turns instrumentation on"""
+    title: str
+    bytes_parsed: int = 0
+    image_download: float = 0.0
+    memo_hit: bool = False
+    stages: list[StageTiming] = field(default_factory=list)
+
+    @property
+    def wall(self) -> float:
+        return sum(i.wall for i in self.stages)
+
+
+@dataclass
+class RunReport:
+    """PageReports summed over an import"""
+    pages: int = 0
+    memo_hits: int = 0
+    bytes_parsed: int = 0
+    image_download: float = 0.0
+    stages: dict[str, StageTiming] = field(default_factory=dict)
+
+    def add(self, report: PageReport):
+        self.pages += 1
+        self.memo_hits += report.memo_hit
+        self.bytes_parsed += report.bytes_parsed
+        self.image_download += report.image_download
+
+        for stage in report.stages:
+            self.stages.setdefault(stage.name, StageTiming(stage.name)).add(stage)
+
+    def slowest(self, n: int = 3) -> list[StageTiming]:
+        return sorted(self.stages.values(), key=lambda i: i.wall, reverse=True)[:n]
+
+    def summary(self, n: int = 3) -> str:
+        stages = ", ".join(f"{i.name} {i.wall:.2f}s ({i.cpu:.2f}s cpu)" for i in self.slowest(n))
+
+        return (
+            f"{self.pages} pages ({self.memo_hits} unchanged html), {self.bytes_parsed / 1024 / 1024:.1f}MiB parsed, "
+            f"{self.image_download:.2f}s downloading images, slowest: {stages}"
+        )
+
+
+# The report of the page being converted, so image downloads deep in a handler can be attributed to it
+current_report: ContextVar[PageReport | None] = ContextVar("current_report", default=None)
+
+
+def _node_count(content: Any) -> int:
+    return len(content.n) if hasattr(content, "n") else 0
+
+
+def timed(name: str, func: Callable, content: Any, *args) -> tuple[Any, StageTiming]:
+    """Runs func(content, *args), returning its result and how long it took"""
+    nodes_before = _node_count(content)
+    wall, cpu = time.perf_counter(), time.process_time()
+
+    result = func(content, *args)
+
+    timing = StageTiming(
+        name=name,
+        wall=time.perf_counter() - wall,
+        cpu=time.process_time() - cpu,
+        nodes_before=nodes_before,
+    )
+    timing.nodes_after = _node_count(result if result is not None else content)
+
+    return result, timing
+
+
+async def timed_async(name: str, func: Callable[..., Awaitable], content: Any, *args) -> tuple[Any, StageTiming]:
+    """timed for coroutines, cpu time is that of the whole process so includes anything interleaved on the loop"""
+    nodes_before = _node_count(content)
+    wall, cpu = time.perf_counter(), time.process_time()
+
+    result = await func(content, *args)
+
+    timing = StageTiming(
+        name=name,
+        wall=time.perf_counter() - wall,
+        cpu=time.process_time() - cpu,
+        nodes_before=nodes_before,
+    )
+    timing.nodes_after = _node_count(result if result is not None else content)
+
+    return result, timing
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from hashlib import sha256
+from typing import TYPE_CHECKING, Protocol
+
+from services.discord.shared.providers.wikia.aiohttp.wikia import Page
+from shared.cache import LRUCache
+
+if TYPE_CHECKING:
+    from services.discord.shared.providers.wikia.converters.convert_strategy import ConvertedPage
+
+
+__all__ = (
+    "MemoStore",
+    "ConversionMemo",
+    "content_key",
+    "get_memo",
+    "open_memo",
+    "close_memo",
+)
+
+
+def content_key(page: Page, colour_mode: str) -> str:
+    """Digest of everything a converter reads from a page, and of the colour mode its embed colour depends on"""
+    digest = sha256()
+
+    for value in (page.title, page.url, page.text, colour_mode):
+        digest.update(value.encode())
+        digest.update(b"\0")
+
+    return digest.hexdigest()
+
+
+class MemoStore(Protocol):
+    async def read(self, key: str, wikia: str, version: int) -> ConvertedPage | None:
+        ...
+
+    async def write(self, key: str, wikia: str, version: int, page: ConvertedPage):
+        ...
+
+
+class ConversionMemo:
+    """Converted pages keyed by content_key, wikia and converter version
+
+    A converter's version is part of the key, so bumping it misses every entry it made before.
+    """
+
+    def __init__(self, store: MemoStore | None = None, maxsize: int = 1024):
+        self.store = store
+
+        self._memory: LRUCache[tuple[str, str, int], ConvertedPage] = LRUCache(maxsize)
+
+    async def read(self, key: str, wikia: str, version: int) -> ConvertedPage | None:
+        page = self._memory.get((key, wikia, version))
+
+        if page is None and self.store is not None:
+            page = await self.store.read(key, wikia, version)
+
+            if page is not None:
+                self._memory.set((key, wikia, version), page)
+
+        return page
+
+    async def write(self, key: str, wikia: str, version: int, page: ConvertedPage):
+        self._memory.set((key, wikia, version), page)
+
+        if self.store is not None:
+            await self.store.write(key, wikia, version, page)
+
+
+_memo: ConversionMemo | None = None
+
+
+def get_memo() -> ConversionMemo | None:
+    return _memo
+
+
+def open_memo(store: MemoStore | None = None, maxsize: int = 1024) -> ConversionMemo:
+    global _memo
+
+    _memo = ConversionMemo(store, maxsize=maxsize)
+
+    return _memo
+
+
+def close_memo():
+    global _memo
+
+    _memo = None
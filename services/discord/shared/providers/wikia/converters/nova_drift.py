@@ -1,4 +1,3 @@
-from services.discord.shared.providers.wikia.aiohttp.wikia import Page
 from . import convert_strategy
 
 
@@ -32,20 +31,27 @@ def handler_find_stat_fields(content: convert_strategy.Handler, page: convert_st
     content.n = content.n[2:]
 
 
-async def converter(page: Page) -> convert_strategy.ConvertedPage:
-    return await convert_strategy.behaviour(
-        (
-            convert_strategy.handler_find_image,
-            convert_strategy.handler_find_colour,
-            convert_strategy.handler_trim_empty_tags,
-            handler_find_stat_fields,
-            handler_find_patch,
-            convert_strategy.handler_trim_before_content,
-            convert_strategy.handler_merge_td_into_li,
-            convert_strategy.handler_remove_leftover_td,
-            convert_strategy.handler_join_li_semicolons,
-            convert_strategy.handler_collapse_ext,
-            convert_strategy.handler_find_fields,
-        ),
-        page,
-    )
+HANDLERS = (
+    convert_strategy.handler_find_image,
+    convert_strategy.handler_find_colour,
+    convert_strategy.handler_trim_empty_tags,
+    handler_find_stat_fields,
+    handler_find_patch,
+    convert_strategy.handler_trim_before_content,
+    convert_strategy.handler_merge_td_into_li,
+    convert_strategy.handler_remove_leftover_td,
+    convert_strategy.handler_join_li_semicolons,
+    convert_strategy.handler_collapse_ext,
+    convert_strategy.handler_find_fields,
+)
+
+
+converter = convert_strategy.Converter(
+    wikia="nova-drift",
+    version=1,
+    handlers=HANDLERS,
+    # handler_find_fields stops at the gallery, nothing after it is read
+    terminal_section="Gallery",
+)
+
+stream_converter = converter.stream
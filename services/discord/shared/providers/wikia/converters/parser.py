@@ -1,62 +1,129 @@
 from html.parser import HTMLParser as _HTMLParser
 
+try:
+    from lxml import etree as _lxml_etree
+except ImportError:
+    _lxml_etree = None
+
+
+_COMBINERS = frozenset((' ', ',', ';'))
+
 
 class HTMLTag(list):
+    """A parsed tag holding the text fragments found inside it
+
+    While parsing, fragments combined onto the last value are buffered and joined once when the tag is closed.
+    """
+    __slots__ = ('_pending',)
+
     tag = None
+    kind = 0
+
+    def __init__(self, values=()):
+        super().__init__(values)
+        self._pending = None
+
+    def _combines(self, value, last_value) -> bool:
+        return value[0] in _COMBINERS \
+            or last_value[-1] in _COMBINERS \
+            or value == ')' \
+            or value == '.'
 
     def append(self, value) -> None:
-        combiners = ' ', ',', ';'
-        if not self \
-                or (all(value[0] != i and self[-1][-1] != i for i in combiners)
-                    and value != ')'
-                    and value != '.'
-        ):
-            super().append(value)
-        else:
+        self.close()
+
+        if self and self._combines(value, self[-1]):
             self[-1] += value
+        else:
+            super().append(value)
+
+    def add_text(self, value) -> None:
+        """Buffered append, the tag must be closed before it is read"""
+        pending = self._pending
+
+        if pending is not None:
+            if self._combines(value, pending[-1]):
+                pending.append(value)
+                return
+
+            self.close()
+        elif self and self._combines(value, self[-1]):
+            self._pending = [self[-1], value]
+            return
+
+        super().append(value)
+
+    def close(self):
+        if self._pending is not None:
+            self[-1] = ''.join(self._pending)
+            self._pending = None
+
+    def __reduce__(self):
+        self.close()
+        return self.__class__, (list(self),)
 
     def __repr__(self):
         return str(f"{self.tag} {super().__repr__()}")
 
 
 class P(HTMLTag):
+    __slots__ = ()
     tag = 'p'
+    kind = 1
 
 
 class A(HTMLTag):
+    __slots__ = ()
     tag = 'a'
+    kind = 2
 
 
 class Li(HTMLTag):
+    __slots__ = ()
     tag = 'li'
+    kind = 3
 
 
 class Dl(HTMLTag):
+    __slots__ = ()
     tag = 'dl'
+    kind = 4
 
 
 class Td(HTMLTag):
+    __slots__ = ()
     tag = 'td'
+    kind = 5
 
 
 class Th(HTMLTag):
+    __slots__ = ()
     tag = 'th'
+    kind = 6
 
 
 class H2(HTMLTag):
+    __slots__ = ()
     tag = 'h2'
+    kind = 7
 
 
 class Url(HTMLTag):
+    __slots__ = ()
     tag = 'url'
+    kind = 8
 
 
 class H1(HTMLTag):
+    __slots__ = ()
     tag = 'h1'
+    kind = 9
 
 
 class Extra(HTMLTag):
+    __slots__ = ()
     tag = 'ext'
+    kind = 10
 
 
 class Handler:
@@ -84,6 +151,9 @@ class Handler:
         self.scope = self.n[-1]
 
     def zoom_out(self):
+        if self.scope is not self.n:
+            self.scope.close()
+
         self.scope = self.n
 
     def append_tag(self, tag):
@@ -106,58 +176,191 @@ class Handler:
     def __str__(self):
         return str(self.n)
 
+    def discard(self, index: int):
+        """Marks the node at index for removal, it is dropped by the next compact"""
+        self.n[index] = None
+
+    def compact(self, key=None):
+        """Drops discarded nodes, and nodes failing key, in a single in place pass"""
+        n = self.n
+
+        write = 0
+        for i in n:
+            if i is not None and (key is None or key(i)):
+                n[write] = i
+                write += 1
+
+        del n[write:]
+
     def filter(self, key):
-        self.n = [*filter(key, self.n)]
+        self.compact(key)
+
+
+_URL_ATTRIBUTES = frozenset(('data-src', 'href', 'src'))
+
+
+class _PythonTokenizer(_HTMLParser):
+    """Pure python tokenizer, always available"""
+
+    def __init__(self, sink: "PreciseHTMLParser"):
+        super().__init__()
+        self.handle_starttag = sink.handle_starttag
+        self.handle_endtag = sink.handle_endtag
+        self.handle_data = sink.handle_data
+
+    def close(self):
+        # Data held back at the end of the input has always been dropped, flushing it would add trailing nodes
+        pass
+
+
+_LXML_IMPLIED_TAGS = frozenset(('html', 'body'))
 
 
-class PreciseHTMLParser(_HTMLParser):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+class _LxmlTarget:
+    def __init__(self, sink: "PreciseHTMLParser"):
+        self.sink = sink
+        self.pending = []
+
+    def _flush(self):
+        # html.parser reports the text between two tags as one piece, lxml may split it
+        if self.pending:
+            data, self.pending = ''.join(self.pending), []
+            self.sink.handle_data(data)
+
+    def start(self, tag, attrib):
+        self._flush()
+        if tag not in _LXML_IMPLIED_TAGS:
+            self.sink.handle_starttag(tag, list(attrib.items()))
+
+    def end(self, tag):
+        self._flush()
+        if tag not in _LXML_IMPLIED_TAGS:
+            self.sink.handle_endtag(tag)
+
+    def data(self, data):
+        self.pending.append(data)
+
+    def comment(self, text):
+        self._flush()
+
+    def close(self):
+        self._flush()
+
+
+class _LxmlTokenizer:
+    """libxml2 backed tokenizer, used when lxml is installed"""
+
+    def __init__(self, sink: "PreciseHTMLParser"):
+        self._target = _LxmlTarget(sink)
+        self._parser = _lxml_etree.HTMLParser(target=self._target, remove_comments=True)
+
+    def feed(self, data):
+        self._parser.feed(data)
+
+    def close(self):
+        self._parser.close()
+
+
+# lxml is a few times faster but repairs malformed markup (e.g. a <div> inside a <p>) differently to html.parser
+# It produces the same tree for well formed pages, so it is opt in
+DEFAULT_TOKENIZER = 'python'
+
+TOKENIZERS = {
+    'python': _PythonTokenizer,
+}
+
+if _lxml_etree is not None:
+    TOKENIZERS['lxml'] = _LxmlTokenizer
+
+
+class PreciseHTMLParser:
+    # Consecutive tags of these kinds are merged into one node
+    _MERGED_TAGS = {i.tag: i for i in (Li, Dl)}
+    _BLOCK_TAGS = {i.tag: i for i in (P, H2, Td, Th, H1)}
+    _CLOSING_TAGS = frozenset((*_MERGED_TAGS, *_BLOCK_TAGS))
+
+    def __init__(self, tokenizer: str | None = None, terminal_section: str | None = None):
         self.handle = Handler()
         self.depth = 0
+        # Once the h2 heading named terminal_section is parsed the rest of the page is ignored
+        self.terminal_section = terminal_section
+        self.done = False
+        self._tokenizer = TOKENIZERS[tokenizer or DEFAULT_TOKENIZER](self)
 
     def handle_starttag(self, tag, attrs):
-        for i in (Li, Dl):
-            if i.tag != tag:
-                continue
+        if self.done:
+            return
+
+        handle = self.handle
 
-            if self.handle.n and isinstance(self.handle.n[-1], i):
-                self.handle.zoom_in()
+        merged_tag = self._MERGED_TAGS.get(tag)
+        if merged_tag is not None:
+            if handle.n and handle.n[-1].kind == merged_tag.kind:
+                handle.zoom_in()
             else:
-                self.handle.append_tag(i())
+                handle.append_tag(merged_tag())
             return
 
-        for i in (P, H2, Td, Th, H1):
-            if i.tag != tag:
-                continue
-
-            self.handle.append_tag(i())
+        block_tag = self._BLOCK_TAGS.get(tag)
+        if block_tag is not None:
+            handle.append_tag(block_tag())
 
         for key, item in attrs:
-            if key in ('data-src', 'href', 'src') \
-                    and item[:5] == 'https':
-                item = Url((item,))
-                self.handle.zoom_out()
-                self.handle.n.append(item)
+            if key in _URL_ATTRIBUTES and item and item[:5] == 'https':
+                handle.zoom_out()
+                handle.n.append(Url((item,)))
 
     def handle_endtag(self, tag):
-        if any(i.tag == tag for i in (Li, Dl, P, H2, Td, Th, H1)):
+        if self.done:
+            return
+
+        if tag in self._CLOSING_TAGS:
+            scope = self.handle.scope
             self.handle.zoom_out()
 
+            # Out of every tag the scope is the handler's node list
+            if (
+                    self.terminal_section is not None
+                    and isinstance(scope, H2)
+                    and scope
+                    and scope[0] == self.terminal_section
+            ):
+                self.done = True
+
     def handle_data(self, data):
-        data = data.replace('  ', ' ')  # Non breaking Space
+        if self.done:
+            return
+
+        data = data.replace('\xa0\xa0', ' ')  # Non breaking Space
 
         if data.strip():  # Ignore " "
-            if self.handle.is_zoomed_in:
-                self.handle.scope.append(data)
-            elif self.handle.n and isinstance(self.handle.n[-1], Extra):
-                self.handle.n[-1].append(data)
+            handle = self.handle
+
+            if handle.is_zoomed_in:
+                handle.scope.add_text(data)
+            elif handle.n and handle.n[-1].kind == Extra.kind:
+                handle.n[-1].append(data)
             else:
-                self.handle.append_tag(Extra((data,)))
-                self.handle.zoom_out()
+                handle.append_tag(Extra((data,)))
+                handle.zoom_out()
 
     def feed(self, data) -> Handler:
+        """Parses data, can be called repeatedly with consecutive pieces of a page"""
+        if self.done:
+            return self.handle
+
         data = data.replace('\u200b', '')
 
-        super().feed(data)
+        self._tokenizer.feed(data)
+        return self._close_nodes()
+
+    def close(self) -> Handler:
+        self._tokenizer.close()
+        return self._close_nodes()
+
+    def _close_nodes(self) -> Handler:
+        # Only the node in scope buffers text, every other node was closed when the handler zoomed out of it
+        if self.handle.is_zoomed_in:
+            self.handle.scope.close()
+
         return self.handle
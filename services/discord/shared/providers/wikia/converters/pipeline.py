@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from functools import lru_cache, update_wrapper
+from typing import Any, Callable
+
+from services.discord.shared.providers.wikia.converters.parser import Handler, HTMLTag
+
+
+__all__ = (
+    "NodeHandler",
+    "FusedNodeHandler",
+    "node_handler",
+    "compile_handlers",
+)
+
+
+NodeTransform = Callable[[HTMLTag, Any, dict], HTMLTag | None]
+NodeFlush = Callable[[Any, dict], HTMLTag | None]
+
+
+class NodeHandler:
+    """A handler that looks at one node at a time
+
+    transform(node, page, state) returns the node to keep, a replacement for it, or None to drop it.
+    state is a dict private to the handler for one pass, for handlers that depend on the nodes before.
+    A transform may only change nodes it has not passed on yet, this is what lets consecutive node handlers share
+    one pass. To change a node after seeing the ones following it, hold it in state and return it later,
+    flush(page, state) returns the node still held when the pass ends.
+
+    Called like any other handler it makes a pass of its own.
+    """
+
+    def __init__(self, transform: NodeTransform, flush: NodeFlush | None = None):
+        self.transform = transform
+        self.flush = flush
+        update_wrapper(self, transform)
+
+    def __call__(self, content: Handler, page: Any):
+        _run_pass((self,), content, page)
+
+    def __reduce__(self):
+        # Pickled by name like the function it wraps, so converters can be sent to worker processes
+        return self.__qualname__
+
+
+class FusedNodeHandler:
+    """Consecutive node handlers run in a single pass, giving the same result as running them in turn"""
+
+    def __init__(self, handlers: tuple[NodeHandler, ...]):
+        self.handlers = handlers
+        self.__name__ = "+".join(i.__name__ for i in handlers)
+
+    def __call__(self, content: Handler, page: Any):
+        _run_pass(self.handlers, content, page)
+
+    def __repr__(self):
+        return f"<FusedNodeHandler {self.__name__}>"
+
+
+def node_handler(transform: NodeTransform | None = None, *, flush: NodeFlush | None = None):
+    """Decorates a node transform, as @node_handler or @node_handler(flush=...)"""
+    if transform is None:
+        return lambda i: NodeHandler(i, flush)
+
+    return NodeHandler(transform, flush)
+
+
+def _run_pass(handlers: tuple[NodeHandler, ...], content: Handler, page: Any):
+    n = content.n
+    transforms = tuple(i.transform for i in handlers)
+    states = [{} for _ in handlers]
+
+    # Every node written was read first, so the list is rewritten in place
+    write = 0
+    for node in n:
+        for transform, state in zip(transforms, states):
+            node = transform(node, page, state)
+
+            if node is None:
+                break
+        else:
+            n[write] = node
+            write += 1
+
+    for x, handler in enumerate(handlers):
+        if handler.flush is None:
+            continue
+
+        node = handler.flush(page, states[x])
+
+        for transform, state in zip(transforms[x+1:], states[x+1:]):
+            if node is None:
+                break
+
+            node = transform(node, page, state)
+
+        if node is not None:
+            n[write] = node
+            write += 1
+
+    del n[write:]
+
+
+@lru_cache(maxsize=None)
+def compile_handlers(funcs: tuple[Callable, ...]) -> tuple[Callable, ...]:
+    """Fuses each run of consecutive node handlers, any other handler is a barrier between runs"""
+    compiled = []
+    run = []
+
+    for func in (*funcs, None):
+        if isinstance(func, NodeHandler):
+            run.append(func)
+            continue
+
+        if len(run) == 1:
+            compiled.append(run[0])
+        elif run:
+            compiled.append(FusedNodeHandler(tuple(run)))
+
+        run = []
+
+        if func is not None:
+            compiled.append(func)
+
+    return tuple(compiled)
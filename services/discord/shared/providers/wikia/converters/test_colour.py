@@ -0,0 +1,60 @@
+from unittest import TestCase, skipIf
+from unittest.mock import patch
+import io
+import random
+
+from PIL import Image, ImageStat
+
+from services.discord.shared.providers.wikia.converters import colour
+
+
+def _encode(im: Image.Image, image_format: str) -> bytes:
+    byte_io = io.BytesIO()
+    im.save(byte_io, format=image_format)
+    return byte_io.getvalue()
+
+
+def _noise(width: int, height: int) -> Image.Image:
+    rng = random.Random(width * height)
+    return Image.frombytes("RGB", (width, height), bytes(rng.randrange(256) for _ in range(width * height * 3)))
+
+
+class ColourSourceUrlTest(TestCase):
+    def test_fast_mode_requests_a_thumbnail(self):
+        self.assertEqual(
+            colour.colour_source_url("https://static.wikia.nocookie.net/a/b/A.png/revision/latest", colour.ColourMode.FAST),
+            "https://static.wikia.nocookie.net/a/b/A.png/revision/latest/scale-to-width-down/64",
+        )
+
+    def test_strict_mode_requests_the_original(self):
+        url = "https://static.wikia.nocookie.net/a/b/A.png/revision/latest"
+
+        self.assertEqual(colour.colour_source_url(url, colour.ColourMode.STRICT), url)
+
+
+class MedianColourTest(TestCase):
+    def test_solid_image(self):
+        for image_format in ("PNG", "JPEG"):
+            with self.subTest(image_format=image_format):
+                data = _encode(Image.new("RGB", (640, 480), (200, 100, 50)), image_format)
+
+                self.assertEqual(colour.median_colour(data), (200, 100, 50))
+
+    @skipIf(colour._np is None, "numpy is not installed")
+    def test_numpy_matches_image_stat(self):
+        data = _encode(_noise(63, 41), "PNG")
+
+        with patch.object(colour, "_np", None):
+            expected = colour.median_colour(data)
+
+        self.assertEqual(colour.median_colour(data), expected)
+
+    def test_strict_mode_matches_the_original_crop(self):
+        im = _noise(40, 24)
+
+        cropped = im.crop((10, 6, 18, 30))
+
+        self.assertEqual(
+            colour.median_colour(_encode(im, "PNG"), colour.ColourMode.STRICT),
+            tuple(ImageStat.Stat(cropped)._getmedian()),
+        )
@@ -0,0 +1,86 @@
+from datetime import timedelta
+from unittest import IsolatedAsyncioTestCase, TestCase
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from services.discord.shared.providers.wikia.aiohttp import close_session
+from services.discord.shared.providers.wikia.converters import colour_cache
+
+
+class MemoryStore:
+    def __init__(self):
+        self.entries = {}
+
+    async def read(self, url: str):
+        return self.entries.get(url)
+
+    async def write(self, image_colour: colour_cache.ImageColour):
+        self.entries[image_colour.url] = image_colour
+
+
+class NormaliseImageUrlTest(TestCase):
+    def test_scaled_url_is_normalised(self):
+        self.assertEqual(
+            colour_cache.normalise_image_url(
+                "https://static.wikia.nocookie.net/nova-drift/images/a/a1/A.png/revision/latest/scale-to-width-down/268?cb=1"
+            ),
+            "https://static.wikia.nocookie.net/nova-drift/images/a/a1/A.png/revision/latest",
+        )
+
+
+class ColourCacheTest(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests = []
+        self.computed = []
+
+        async def image(request: web.Request) -> web.Response:
+            self.requests.append(request.headers.get("If-None-Match"))
+            await asyncio.sleep(0.01)
+
+            if request.headers.get("If-None-Match") == '"v1"':
+                return web.Response(status=304)
+
+            return web.Response(body=b"image", headers={"ETag": '"v1"'})
+
+        app = web.Application()
+        app.router.add_get("/image.png/revision/latest", image)
+
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.url = str(self.server.make_url("/image.png/revision/latest"))
+
+    async def asyncTearDown(self):
+        await close_session()
+        await self.server.close()
+
+    async def compute(self, data: bytes) -> colour_cache.Colour:
+        self.computed.append(data)
+        return 1, 2, 3
+
+    async def test_fresh_colour_skips_the_download(self):
+        store = MemoryStore()
+
+        self.assertEqual(await colour_cache.ColourCache(store).read(self.url, self.compute), (1, 2, 3))
+        self.assertEqual(await colour_cache.ColourCache(store).read(f"{self.url}?cb=2", self.compute), (1, 2, 3))
+
+        self.assertEqual(self.requests, [None])
+        self.assertEqual(self.computed, [b"image"])
+
+    async def test_stale_colour_is_revalidated(self):
+        cache = colour_cache.ColourCache(MemoryStore(), ttl=timedelta(0))
+
+        await cache.read(self.url, self.compute)
+        await cache.read(self.url, self.compute)
+
+        self.assertEqual(self.requests, [None, '"v1"'])
+        self.assertEqual(self.computed, [b"image"])
+
+    async def test_concurrent_reads_share_a_download(self):
+        cache = colour_cache.ColourCache()
+
+        results = await asyncio.gather(*(cache.read(self.url, self.compute) for _ in range(4)))
+
+        self.assertEqual(results, [(1, 2, 3)] * 4)
+        self.assertEqual(self.requests, [None])
@@ -0,0 +1,264 @@
+from concurrent.futures import ProcessPoolExecutor
+from unittest import IsolatedAsyncioTestCase, TestCase
+import multiprocessing
+from unittest.mock import AsyncMock, patch
+
+from services.discord.shared.providers.wikia.aiohttp.wikia import Page, PageStream, RawQueryResult
+from services.discord.shared.providers.wikia.converters import convert_strategy
+from services.discord.shared.providers.wikia.converters.nova_drift import HANDLERS, converter, stream_converter
+from services.discord.shared.providers.wikia.converters.instrumentation import PageReport, RunReport
+from services.discord.shared.providers.wikia.converters.parser import Handler, Li, P, Td, H2, Extra, PreciseHTMLParser
+from services.discord.shared.providers.wikia.converters.test_parser import PAGE
+
+
+EXPECTED_FIELDS = [
+    {
+        'name': '**Effect**',
+        'value': (
+            '• Bullets deal +50% damage, but travel 20% slower.\n'
+            '• Hits cause a small explosion (radius 20 ; damage 5). Stacks with Overcharge.\n'
+        ),
+    },
+    {
+        'name': '**Stat**',
+        'value': '• Value\n',
+    },
+    {
+        'name': '**Loose paragraph text, with a comma , and more.\nStray text outside of a tag\nmore stray text\n**',
+        'value': '• Notes\n',
+    },
+    {
+        'name': '**Works with Split Shot ;and splits.**',
+        'value': '• Does not stack with itself\n• Orphan cell\n',
+    },
+    {
+        'name': '**Tail paragraph.**',
+        'value': '• Gallery\n',
+    },
+]
+
+
+STREAMED_PAGE = f"{PAGE}\n<!-- \nNewPP limit report\n-->"
+
+# A prop=revisions&rvparse=1&formatversion=2 response, its html has no limit report after it
+RVPARSE_RESPONSE = {
+    "batchcomplete": True,
+    "query": {
+        "pages": [
+            {
+                "pageid": 1,
+                "ns": 0,
+                "title": "Antimatter Rounds",
+                "contentmodel": "wikitext",
+                "pagelanguage": "en",
+                "touched": "2023-05-01T12:00:00Z",
+                "lastrevid": 42,
+                "length": 1024,
+                "revisions": [
+                    {
+                        "revid": 42,
+                        "parentid": 41,
+                        "slots": {
+                            "main": {
+                                "contentmodel": "wikitext",
+                                "contentformat": "text/x-wiki",
+                                "content": PAGE,
+                            },
+                        },
+                    },
+                ],
+            },
+        ],
+    },
+}
+
+
+async def _chunks(text: str, size: int):
+    for i in range(0, len(text), size):
+        yield text[i:i+size]
+
+
+def _tree(handler: Handler) -> list:
+    return [(i.tag, list(i)) for i in handler]
+
+
+def _handler(*nodes) -> Handler:
+    handler = Handler()
+    handler.n = list(nodes)
+    return handler
+
+
+class HandlerTest(TestCase):
+    def test_merge_td_into_li_skips_after_merging(self):
+        content = _handler(Li(('a',)), Td(('b',)), P(('c',)), Td(('d',)), Li(('e',)), H2(('f',)))
+
+        convert_strategy.handler_merge_td_into_li(content, None)
+
+        self.assertEqual(
+            [(i.tag, list(i)) for i in content],
+            [('li', ['a', 'b']), ('p', ['c']), ('td', ['d']), ('li', ['e']), ('h2', ['f'])],
+        )
+
+    def test_remove_leftover_td_skips_after_removing(self):
+        content = _handler(Td(('a',)), Td(('b',)), P(('c',)), Td(('d',)))
+
+        convert_strategy.handler_remove_leftover_td(content, None)
+
+        self.assertEqual(
+            [(i.tag, list(i)) for i in content],
+            [('td', ['b']), ('p', ['c'])],
+        )
+
+    def test_collapse_ext(self):
+        content = _handler(Extra(('a',)), P(('b',)), Extra(('c',)), Extra(('d',)))
+
+        convert_strategy.handler_collapse_ext(content, None)
+
+        self.assertEqual(
+            [(i.tag, list(i)) for i in content],
+            [('h2', ['Stats']), ('p', ['bc'])],
+        )
+
+
+class ConverterTest(IsolatedAsyncioTestCase):
+    async def test_nova_drift_converter(self):
+        page = Page(
+            wikia="nova-drift",
+            title="Antimatter Rounds",
+            id=1,
+            text=f"{PAGE}\n<!-- \nNewPP limit report\n-->",
+            url="https://nova-drift.fandom.com/wiki/Antimatter_Rounds",
+        )
+
+        with patch.object(convert_strategy, "_get_avg_colour", AsyncMock(return_value=(10, 20, 30))):
+            result = await converter(page)
+
+        self.assertEqual(result.data.title, "**ANTIMATTER ROUNDS**")
+        self.assertEqual(result.data.color, 0x0a141e)
+        self.assertEqual(
+            result.data.get_thumbnail_url(),
+            "https://static.wikia.nocookie.net/nova-drift/images/a/a1/Antimatter_Rounds.png/revision/latest",
+        )
+        self.assertEqual([field.dict() for field in result.data.fields], EXPECTED_FIELDS)
+
+    async def test_nova_drift_converter_rvparse_page(self):
+        result = RawQueryResult(**RVPARSE_RESPONSE)
+        page = result.query.pages[0].as_page(
+            url="https://nova-drift.fandom.com/wiki/Antimatter_Rounds",
+            wikia="nova-drift",
+        )
+
+        with patch.object(convert_strategy, "_get_avg_colour", AsyncMock(return_value=(10, 20, 30))):
+            result = await converter(page)
+
+        self.assertEqual(result.revision_id, 42)
+        self.assertEqual([field.dict() for field in result.data.fields], EXPECTED_FIELDS)
+
+    def test_parse_keeps_text_after_a_comment(self):
+        handler = convert_strategy._parse("<p>a</p><!-- note --><p>b</p>\n<!-- \nNewPP limit report\n--><p>c</p>")
+
+        self.assertEqual(_tree(handler), [('p', ['a']), ('p', ['b'])])
+
+    async def test_nova_drift_converter_in_process_pool(self):
+        page = Page(
+            wikia="nova-drift",
+            title="Antimatter Rounds",
+            id=1,
+            text=STREAMED_PAGE,
+            url="https://nova-drift.fandom.com/wiki/Antimatter_Rounds",
+        )
+
+        executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        self.addCleanup(executor.shutdown)
+
+        with patch.object(convert_strategy, "_get_avg_colour", AsyncMock(return_value=(10, 20, 30))):
+            result = await convert_strategy.behaviour(HANDLERS, page, executor)
+
+        self.assertEqual(result.data.color, 0x0a141e)
+        self.assertEqual([field.dict() for field in result.data.fields], EXPECTED_FIELDS)
+
+        report = PageReport(page.title)
+
+        with patch.object(convert_strategy, "_get_avg_colour", AsyncMock(return_value=(10, 20, 30))):
+            result = await convert_strategy.behaviour(HANDLERS, page, executor, report)
+
+        self.assertEqual(result.data.color, 0x0a141e)
+        self.assertEqual(
+            sorted(i.name for i in report.stages),
+            sorted(["parse", *(i.__name__ for i in convert_strategy.compile_handlers(HANDLERS))]),
+        )
+
+
+    async def test_report_times_every_stage(self):
+        page = Page(
+            wikia="nova-drift",
+            title="Antimatter Rounds",
+            id=1,
+            text=STREAMED_PAGE,
+            url="https://nova-drift.fandom.com/wiki/Antimatter_Rounds",
+        )
+        report = PageReport(page.title)
+
+        with patch.object(convert_strategy, "_get_avg_colour", AsyncMock(return_value=(10, 20, 30))):
+            result = await converter(page, report)
+
+        self.assertEqual([field.dict() for field in result.data.fields], EXPECTED_FIELDS)
+        self.assertEqual(
+            [i.name for i in report.stages],
+            ["parse", *(i.__name__ for i in convert_strategy.compile_handlers(HANDLERS))],
+        )
+        self.assertEqual(report.bytes_parsed, len(STREAMED_PAGE.encode()))
+
+        for before, after in zip(report.stages, report.stages[1:]):
+            self.assertEqual(before.nodes_after, after.nodes_before)
+
+        run_report = RunReport()
+        run_report.add(report)
+        run_report.add(report)
+
+        self.assertEqual(run_report.pages, 2)
+        self.assertAlmostEqual(run_report.stages["parse"].wall, report.stages[0].wall * 2)
+
+
+class ParseStreamTest(IsolatedAsyncioTestCase):
+    def parse_whole(self) -> Handler:
+        parser = PreciseHTMLParser()
+        parser.feed(STREAMED_PAGE[:STREAMED_PAGE.index('<!--')].rstrip())
+        return parser.close()
+
+    async def test_chunked_stream_matches_whole_page(self):
+        expected = _tree(self.parse_whole())
+
+        for size in (1, 2, 3, 7, 64, len(STREAMED_PAGE)):
+            with self.subTest(size=size):
+                handler = await convert_strategy._parse_stream(_chunks(STREAMED_PAGE, size))
+                self.assertEqual(_tree(handler), expected)
+
+    async def test_stream_without_limit_report(self):
+        expected = _tree(self.parse_whole())
+
+        for size in (1, 5, len(PAGE)):
+            with self.subTest(size=size):
+                handler = await convert_strategy._parse_stream(_chunks(PAGE, size))
+                self.assertEqual(_tree(handler), expected)
+
+    async def test_terminal_section_stops_parsing(self):
+        handler = await convert_strategy._parse_stream(_chunks(STREAMED_PAGE, 16), terminal_section="Notes")
+        tree = _tree(handler)
+
+        self.assertEqual(tree[-1], ('h2', ['Notes']))
+        self.assertEqual(tree, _tree(self.parse_whole())[:len(tree)])
+
+    async def test_nova_drift_stream_converter(self):
+        page = PageStream(
+            wikia="nova-drift",
+            title="Antimatter Rounds",
+            id=1,
+            url="https://nova-drift.fandom.com/wiki/Antimatter_Rounds",
+            chunks=_chunks(STREAMED_PAGE, 100),
+        )
+
+        with patch.object(convert_strategy, "_get_avg_colour", AsyncMock(return_value=(10, 20, 30))):
+            result = await stream_converter(page)
+
+        self.assertEqual([field.dict() for field in result.data.fields], EXPECTED_FIELDS)
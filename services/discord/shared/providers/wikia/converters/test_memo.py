@@ -0,0 +1,65 @@
+from dataclasses import replace
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, patch
+
+from services.discord.shared.providers.wikia.aiohttp.wikia import Page
+from services.discord.shared.providers.wikia.converters import convert_strategy, memo
+from services.discord.shared.providers.wikia.converters.colour import ColourMode
+from services.discord.shared.providers.wikia.converters.instrumentation import PageReport
+from services.discord.shared.providers.wikia.converters.nova_drift import converter
+from services.discord.shared.providers.wikia.converters.test_convert_strategy import STREAMED_PAGE
+
+
+def _page(revision_id: int, text: str = STREAMED_PAGE) -> Page:
+    return Page(
+        wikia="nova-drift",
+        title="Antimatter Rounds",
+        id=1,
+        text=text,
+        url="https://nova-drift.fandom.com/wiki/Antimatter_Rounds",
+        revision_id=revision_id,
+    )
+
+
+class ConverterMemoTest(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        memo.open_memo()
+        self.addCleanup(memo.close_memo)
+
+        patcher = patch.object(convert_strategy, "_get_avg_colour", AsyncMock(return_value=(10, 20, 30)))
+        self.get_avg_colour = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_unchanged_content_is_not_converted_again(self):
+        first = await converter(_page(1))
+
+        report = PageReport("Antimatter Rounds")
+        second = await converter(_page(2), report)
+
+        self.assertTrue(report.memo_hit)
+        self.assertEqual(report.stages, [])
+        self.assertEqual(self.get_avg_colour.await_count, 1)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second.revision_id, 2)
+
+    async def test_changed_content_is_converted(self):
+        await converter(_page(1))
+        await converter(_page(2, STREAMED_PAGE.replace("+50%", "+60%")))
+
+        self.assertEqual(self.get_avg_colour.await_count, 2)
+
+    async def test_new_version_misses(self):
+        await converter(_page(1))
+        await replace(converter, version=converter.version + 1)(_page(1))
+
+        self.assertEqual(self.get_avg_colour.await_count, 2)
+
+    async def test_new_colour_mode_misses(self):
+        self.addCleanup(convert_strategy.set_colour_mode, convert_strategy._colour_mode)
+
+        convert_strategy.set_colour_mode(ColourMode.FAST)
+        await converter(_page(1))
+        convert_strategy.set_colour_mode(ColourMode.STRICT)
+        await converter(_page(1))
+
+        self.assertEqual(self.get_avg_colour.await_count, 2)
@@ -0,0 +1,109 @@
+from unittest import TestCase, skipUnless
+
+from services.discord.shared.providers.wikia.converters import parser
+
+
+PAGE = (
+    '<div class="mw-parser-output"><aside class="portable-infobox"><h2 class="pi-title">Antimatter Rounds</h2>'
+    '<figure>'
+    '<a href="https://static.wikia.nocookie.net/nova-drift/images/a/a1/Antimatter_Rounds.png/revision/latest?cb=2020" class="image">'
+    '<img src="https://static.wikia.nocookie.net/nova-drift/images/a/a1/Antimatter_Rounds.png/revision/latest/scale-to-width-down/268?cb=2020" data-src="https://static.wikia.nocookie.net/nova-drift/images/a/a1/Antimatter_Rounds.png/revision/latest/scale-to-width-down/268?cb=2020" width="64"/></a></figure>'
+    '<dl><dt>Prerequisites</dt></dl>'
+    '<table><tr><th>GEAR TYPE</th><td>Weapon</td></tr></table></aside>\n'
+    '<p><b>Last Update</b>: 0.32.1&nbsp;(patch)</p>\n'
+    '<p>Patch notes&nbsp;&nbsp;here.</p>\n'
+    '<div id="toc"><h2>Contents</h2><ul><li><a href="#Effect">1 Effect</a></li><li><a href="#Notes">2 Notes</a></li></ul></div>\n'
+    '<h2><span class="mw-headline" id="Effect">Effect</span></h2>\n'
+    '<ul><li>Bullets deal <b>+50%</b> damage, but travel 20% slower.</li><li>Hits cause a small explosion (radius 20 ; damage 5).</li></ul>\n'
+    '<ul><li>[1] Stacks with <a href="/wiki/Overcharge">Overcharge</a>.</li></ul>\n'
+    '<table class="wikitable"><tr><th>Stat</th><th>Value</th></tr><tr><td>Damage:</td><td>+50%</td></tr><tr><td>Speed</td><td>\'-20%\'</td></tr></table>\n'
+    '<p>Loose paragraph text, with a comma , and more.</p>\n'
+    'Stray text outside of a tag\n'
+    'more stray text\n'
+    '<h2><span class="mw-headline" id="Notes">Notes</span></h2>\n'
+    '<dl><dd>Indented note</dd></dl>\n'
+    '<ul><li>Works with <a href="https://nova-drift.fandom.com/wiki/Split_Shot">Split Shot</a> ;and splits.</li><li>Does not stack\u200b with itself</li></ul>\n'
+    '<td>Orphan cell</td>\n'
+    '<p>Tail paragraph.</p>\n'
+    '<h2><span class="mw-headline" id="Gallery">Gallery</span></h2>\n'
+    '<div class="gallery"><img data-src="https://static.wikia.nocookie.net/nova-drift/images/b/b2/Gallery_Image.png/revision/latest?cb=1"/></div>\n'
+    '<h1>Heading one</h1>\n'
+    '</div>'
+)
+
+
+EXPECTED = [
+    ('h2', ['Antimatter Rounds']),
+    ('url', ['https://static.wikia.nocookie.net/nova-drift/images/a/a1/Antimatter_Rounds.png/revision/latest?cb=2020']),
+    ('url', ['https://static.wikia.nocookie.net/nova-drift/images/a/a1/Antimatter_Rounds.png/revision/latest/scale-to-width-down/268?cb=2020']),
+    ('url', ['https://static.wikia.nocookie.net/nova-drift/images/a/a1/Antimatter_Rounds.png/revision/latest/scale-to-width-down/268?cb=2020']),
+    ('dl', ['Prerequisites']),
+    ('th', ['GEAR TYPE']),
+    ('td', ['Weapon']),
+    ('p', ['Last Update', ': 0.32.1\xa0(patch)']),
+    ('p', ['Patch notes here.']),
+    ('h2', ['Contents']),
+    ('li', ['1 Effect', '2 Notes']),
+    ('h2', ['Effect']),
+    ('li', ['Bullets deal +50% damage, but travel 20% slower.', 'Hits cause a small explosion (radius 20 ; damage 5).', '[1] Stacks with Overcharge.']),
+    ('th', ['Stat']),
+    ('th', ['Value']),
+    ('td', ['Damage:']),
+    ('td', ['+50%']),
+    ('td', ['Speed']),
+    ('td', ["'-20%'"]),
+    ('p', ['Loose paragraph text, with a comma , and more.']),
+    ('ext', ['\nStray text outside of a tag\nmore stray text\n']),
+    ('h2', ['Notes']),
+    ('dl', ['Indented note']),
+    ('li', ['Works with ']),
+    ('url', ['https://nova-drift.fandom.com/wiki/Split_Shot']),
+    ('ext', ['Split Shot ;and splits.']),
+    ('li', ['Does not stack with itself']),
+    ('td', ['Orphan cell']),
+    ('p', ['Tail paragraph.']),
+    ('h2', ['Gallery']),
+    ('url', ['https://static.wikia.nocookie.net/nova-drift/images/b/b2/Gallery_Image.png/revision/latest?cb=1']),
+    ('h1', ['Heading one']),
+]
+
+
+class PreciseHTMLParserTest(TestCase):
+    def test_feed(self):
+        handler = parser.PreciseHTMLParser().feed(PAGE)
+
+        self.assertEqual([(node.tag, list(node)) for node in handler], EXPECTED)
+
+    @skipUnless('lxml' in parser.TOKENIZERS, "lxml is not installed")
+    def test_lxml_tokenizer_matches(self):
+        html_parser = parser.PreciseHTMLParser(tokenizer='lxml')
+        html_parser.feed(PAGE)
+        handler = html_parser.close()
+
+        self.assertEqual([(node.tag, list(node)) for node in handler], EXPECTED)
+
+
+    def test_terminal_section_after_a_link(self):
+        html_parser = parser.PreciseHTMLParser(terminal_section='Gallery')
+        html_parser.feed('<p>a <a href="https://x">b</a></p><h2>Gallery</h2><p>c</p>')
+        handler = html_parser.close()
+
+        self.assertTrue(html_parser.done)
+        self.assertEqual(
+            [(node.tag, list(node)) for node in handler],
+            [('p', ['a ']), ('url', ['https://x']), ('ext', ['b']), ('h2', ['Gallery'])],
+        )
+
+
+class HTMLTagTest(TestCase):
+    def test_buffered_text_matches_append(self):
+        fragments = 'Deals', ' 5', ' damage', ',', 'then', ';', 'more', '.', 'Done', ')'
+
+        appended, buffered = parser.Li(), parser.Li()
+        for fragment in fragments:
+            appended.append(fragment)
+            buffered.add_text(fragment)
+        buffered.close()
+
+        self.assertEqual(buffered, appended)
+        self.assertEqual(buffered, ['Deals 5 damage,then;more.', 'Done)'])
@@ -0,0 +1,80 @@
+from unittest import TestCase
+import pickle
+
+from services.discord.shared.providers.wikia.converters import convert_strategy
+from services.discord.shared.providers.wikia.converters.parser import Handler, Li, P, Td, H2, Dl, Extra
+from services.discord.shared.providers.wikia.converters.pipeline import (
+    FusedNodeHandler,
+    NodeHandler,
+    compile_handlers,
+)
+
+
+NODE_HANDLERS = (
+    convert_strategy.handler_collapse_ext,
+    convert_strategy.handler_remove_leftover_td,
+    convert_strategy.handler_join_li_semicolons,
+    convert_strategy.handler_trim_empty_tags,
+)
+
+
+def _nodes() -> list:
+    return [
+        Li(('a', 'b:', 'c')),
+        Extra(('d',)),
+        Td(('e',)),
+        Td(('f',)),
+        Dl(('g',)),
+        P(),
+        Li(("[1]h", "'i")),
+        Extra(('j',)),
+        H2(('k',)),
+        Td(('l',)),
+    ]
+
+
+def _tree(nodes: list) -> list:
+    return [(i.tag, list(i)) for i in nodes]
+
+
+class CompileHandlersTest(TestCase):
+    def test_node_handlers_are_fused_between_barriers(self):
+        compiled = compile_handlers((
+            convert_strategy.handler_trim_empty_tags,
+            convert_strategy.handler_trim_before_content,
+            convert_strategy.handler_remove_leftover_td,
+            convert_strategy.handler_join_li_semicolons,
+            convert_strategy.handler_find_fields,
+        ))
+
+        self.assertIsInstance(compiled[0], NodeHandler)
+        self.assertIs(compiled[1], convert_strategy.handler_trim_before_content)
+        self.assertIsInstance(compiled[2], FusedNodeHandler)
+        self.assertEqual(compiled[2].handlers, NODE_HANDLERS[1:3])
+        self.assertIs(compiled[3], convert_strategy.handler_find_fields)
+
+    def test_fused_pass_matches_handlers_in_turn(self):
+        expected = Handler()
+        expected.n = _nodes()
+
+        for func in NODE_HANDLERS:
+            func(expected, None)
+
+        fused = Handler()
+        fused.n = _nodes()
+
+        compiled, = compile_handlers(NODE_HANDLERS)
+        compiled(fused, None)
+
+        self.assertEqual(_tree(expected), [
+            ('li', ['a', 'b: cd']),
+            ('td', ['f']),
+            ('li', ["h'ij"]),
+            ('h2', ['k']),
+        ])
+        self.assertEqual(_tree(fused), _tree(expected))
+
+    def test_fused_handler_pickles(self):
+        compiled, = compile_handlers(NODE_HANDLERS)
+
+        self.assertEqual(pickle.loads(pickle.dumps(compiled)).handlers, NODE_HANDLERS)
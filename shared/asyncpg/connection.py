@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from typing import Any
+
+import asyncpg
+from asyncpg.prepared_stmt import PreparedStatement
+import orjson
+
+
+__all__ = (
+    "Connection",
+    "set_json_codecs",
+)
+
+
+def _encode_json(value: Any) -> str:
+    return orjson.dumps(value).decode()
+
+
+async def set_json_codecs(conn: asyncpg.Connection):
+    """json and jsonb are sent and received as python objects, through orjson rather than the json module"""
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(
+            type_name,
+            schema="pg_catalog",
+            encoder=_encode_json,
+            decoder=orjson.loads,
+            format="text",
+        )
+
+
+class Connection(asyncpg.Connection):
+    """Connection keeping every statement it prepares, by query"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self._statements: dict[str, PreparedStatement] = {}
+
+    async def prepared(self, query: str) -> PreparedStatement:
+        statement = self._statements.get(query)
+
+        if statement is None:
+            statement = self._statements[query] = await self.prepare(query)
+
+        return statement
+
+    async def fetch_prepared(self, query: str, *args) -> list[asyncpg.Record]:
+        try:
+            return await (await self.prepared(query)).fetch(*args)
+        except asyncpg.InvalidCachedStatementError:
+            # A migration changed what the statement reads, a transaction it aborted can't be retried
+            self._statements.pop(query, None)
+
+            if self.is_in_transaction():
+                raise
+
+            return await (await self.prepared(query)).fetch(*args)
+
+    async def fetchrow_prepared(self, query: str, *args) -> None | asyncpg.Record:
+        records = await self.fetch_prepared(query, *args)
+
+        return records[0] if records else None
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+import asyncpg
+from asyncpg.pool import Pool
+
+from .connection import Connection, set_json_codecs
+from .register import Register
+
+
+__all__ = (
+    "create_pool",
+)
+
+
+async def create_pool(dsn: str, registers: Iterable[Register] = (), **kwargs) -> Pool:
+    """Pool of Connections using the orjson codecs, each given to registers
+
+    Every connection prepares the registers' statements as it opens. min_size connections are opened before this
+    returns, so the first requests after a cold start neither connect nor prepare.
+    """
+    registers = tuple(registers)
+
+    statements = {
+        statement
+        for register in registers
+        for statement in register.statements
+    }
+
+    async def init(conn: Connection):
+        await set_json_codecs(conn)
+
+        for statement in statements:
+            await conn.prepared(statement)
+
+    pool = await asyncpg.create_pool(dsn=dsn, connection_class=Connection, init=init, **kwargs)
+
+    for register in registers:
+        register.pool = pool
+
+    return pool
@@ -1,6 +1,24 @@
+from __future__ import annotations
+
+import asyncpg
 from asyncpg.pool import Pool
 
 
 class Register:
+    # Hot queries, prepared on each connection as the pool opens it
+    statements: tuple[str, ...] = ()
+
     def __init__(self, pool: Pool):
         self.pool = pool
+
+    async def fetch(self, query: str, *args) -> list[asyncpg.Record]:
+        async with self.pool.acquire() as conn:
+            return await conn.fetch_prepared(query, *args)
+
+    async def fetchrow(self, query: str, *args) -> None | asyncpg.Record:
+        async with self.pool.acquire() as conn:
+            return await conn.fetchrow_prepared(query, *args)
+
+    async def execute(self, query: str, *args):
+        async with self.pool.acquire() as conn:
+            await conn.fetch_prepared(query, *args)
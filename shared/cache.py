@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Generic, Hashable, TypeVar
+import time
+
+
+__all__ = (
+    "LRUCache",
+)
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """In memory mapping that drops the least recently used entry once it holds maxsize entries
+
+    When ttl is given, entries older than ttl seconds are treated as missing.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def get(self, key: K, default: V | None = None) -> V | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+
+        stored_at, value = entry
+
+        if self.ttl is not None and time.monotonic() - stored_at >= self.ttl:
+            del self._entries[key]
+            return default
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V):
+        self._entries[key] = time.monotonic(), value
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: K, default: V | None = None) -> V | None:
+        entry = self._entries.pop(key, None)
+
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self._entries.clear()
+
+    def items(self) -> list[tuple[K, V]]:
+        """Snapshot of the entries, oldest first, without refreshing them"""
+        return [(key, value) for key, (_, value) in self._entries.items()]
+
+    def __contains__(self, key: K) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)